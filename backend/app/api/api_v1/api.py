@@ -1,10 +1,9 @@
 from fastapi import APIRouter
-from app.api.api_v1.endpoints import login, users, organizations, knowledge_bases, documents
+from app.api.api_v1.endpoints import login, users, organizations, knowledge_bases
 
 api_router = APIRouter()
 
 api_router.include_router(login.router, tags=["login"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(organizations.router, prefix="/organizations", tags=["organizations"])
-api_router.include_router(knowledge_bases.router, prefix="/knowledge-bases", tags=["knowledge-bases"])
-api_router.include_router(documents.router, prefix="/documents", tags=["documents"]) 
\ No newline at end of file
+api_router.include_router(knowledge_bases.router, prefix="/knowledge-bases", tags=["knowledge-bases"]) 
\ No newline at end of file
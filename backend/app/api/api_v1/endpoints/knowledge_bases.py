@@ -1,53 +1,77 @@
-from typing import Any, List, Dict
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Any, List, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload, noload, selectinload
 
 from app.api import deps
+from app.models.document import Document
 from app.models.knowledge_base import KnowledgeBase
 from app.models.user import User
 from app.schemas.knowledge_base import KnowledgeBase as KnowledgeBaseSchema
-from app.schemas.knowledge_base import KnowledgeBaseCreate, KnowledgeBaseUpdate
+from app.schemas.knowledge_base import KnowledgeBaseCreate, KnowledgeBaseUpdate, KnowledgeBaseSummary
 from app.schemas.document import DocumentResponse
-from app.services.document_service import DocumentService
+from app.services import providers
+from app.core.config import settings
+from app.utils.pagination import NEXT_CURSOR_HEADER, keyset, page
 
 router = APIRouter()
-document_service = DocumentService()
 
-# Helper function to convert document IDs to strings for proper serialization
-def prepare_document_for_response(doc):
-    # Ensure document has all required fields
-    if not hasattr(doc, 'id') or not hasattr(doc, 'user_id'):
-        return doc
-    
-    # Convert ID properties to strings
-    doc.id = str(doc.id) if doc.id is not None else None
-    doc.user_id = str(doc.user_id) if doc.user_id is not None else None
-    
-    # Ensure tags is a list
-    if not hasattr(doc, 'tags') or doc.tags is None:
-        doc.tags = []
-        
-    return doc
+# Columns loaded for documents listed under a knowledge base; content is never fetched
+DOCUMENT_SUMMARY_COLUMNS = (Document.id, Document.title, Document.tags, Document.created_at, Document.updated_at)
 
-@router.get("/", response_model=List[KnowledgeBaseSchema])
+# Sort key for documents within a knowledge base; matches ix_documents_knowledge_base_id_created_at_id
+DOCUMENT_ORDER = (Document.created_at, Document.id)
+
+@router.get("/", response_model=List[KnowledgeBaseSummary])
 def read_knowledge_bases(
+    response: Response,
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, deprecated=True),
     limit: int = 100,
+    include_documents: bool = False,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Retrieve knowledge bases.
+    Retrieve knowledge bases with their document counts.
+
+    Pass the X-Next-Cursor response header back as ``cursor`` for the next
+    page. The listing takes a fixed number of queries, and its cost does not
+    grow with the number of documents unless ``include_documents`` also loads
+    every document summary of the page's knowledge bases.
     """
-    knowledge_bases = db.query(KnowledgeBase).offset(skip).limit(limit).all()
+    order = (KnowledgeBase.id,)
+    query = db.query(KnowledgeBase).options(
+        joinedload(KnowledgeBase.owner),
+        joinedload(KnowledgeBase.organization)
+    )
+    try:
+        query = keyset(query, order, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if skip and not cursor:
+        query = query.offset(skip)
+    
+    if include_documents:
+        query = query.options(selectinload(KnowledgeBase.documents).load_only(*DOCUMENT_SUMMARY_COLUMNS))
+    else:
+        query = query.options(noload(KnowledgeBase.documents))
+    knowledge_bases, next_cursor = page(query.all(), order, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
-    # Ensure each document has tags as a list for each knowledge base
-    # and convert IDs to strings
-    for kb in knowledge_bases:
-        for i, doc in enumerate(kb.documents):
-            kb.documents[i] = prepare_document_for_response(doc)
-                
-    return knowledge_bases
+    counts = dict(
+        db.query(Document.knowledge_base_id, func.count(Document.id))
+        .filter(Document.knowledge_base_id.in_([kb.id for kb in knowledge_bases]))
+        .group_by(Document.knowledge_base_id)
+        .all()
+    )
+    
+    return [
+        KnowledgeBaseSummary.model_validate(kb).model_copy(update={"documents_count": counts.get(kb.id, 0)})
+        for kb in knowledge_bases
+    ]
 
 @router.post("/", response_model=KnowledgeBaseSchema)
 def create_knowledge_base(
@@ -102,34 +126,81 @@ def read_knowledge_base(
     """
     Get knowledge base by ID.
     """
-    knowledge_base = db.query(KnowledgeBase).filter(KnowledgeBase.id == knowledge_base_id).first()
+    knowledge_base = db.query(KnowledgeBase).options(
+        joinedload(KnowledgeBase.owner),
+        joinedload(KnowledgeBase.organization),
+        selectinload(KnowledgeBase.documents)
+    ).filter(KnowledgeBase.id == knowledge_base_id).first()
     if not knowledge_base:
         raise HTTPException(status_code=404, detail="Knowledge base not found")
-    
-    # Convert document IDs to strings for proper serialization
-    for i, doc in enumerate(knowledge_base.documents):
-        knowledge_base.documents[i] = prepare_document_for_response(doc)
-            
     return knowledge_base
 
 @router.get("/{knowledge_base_id}/documents", response_model=List[DocumentResponse])
 def get_knowledge_base_documents(
+    *,
+    response: Response,
+    db: Session = Depends(deps.get_db),
+    knowledge_base_id: int,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    current_user: User = Depends(deps.get_current_active_user),
+    document_service=Depends(providers.get_document_service),
+) -> Any:
+    """
+    Get the documents belonging to a specific knowledge base, newest first.
+
+    Without ``limit`` every document is returned. With it, pass the
+    X-Next-Cursor response header back as ``cursor`` for the next page.
+    """
+    knowledge_base = db.query(KnowledgeBase).filter(KnowledgeBase.id == knowledge_base_id).first()
+    if not knowledge_base:
+        raise HTTPException(status_code=404, detail="Knowledge base not found")
+    
+    if limit is None:
+        return document_service.get_documents_by_knowledge_base(db, knowledge_base_id)
+    
+    query = db.query(Document).filter(Document.knowledge_base_id == knowledge_base_id)
+    try:
+        query = keyset(query, DOCUMENT_ORDER, cursor, limit, descending=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    documents, next_cursor = page(query.all(), DOCUMENT_ORDER, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return documents
+
+@router.get("/{knowledge_base_id}/documents/export")
+def export_knowledge_base_documents(
     *,
     db: Session = Depends(deps.get_db),
     knowledge_base_id: int,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Get all documents belonging to a specific knowledge base.
+    Stream every document of a knowledge base as NDJSON, oldest first.
+
+    Documents are read in keyset batches, so the cost stays linear in the size
+    of the knowledge base and memory stays bounded by one batch.
     """
     knowledge_base = db.query(KnowledgeBase).filter(KnowledgeBase.id == knowledge_base_id).first()
     if not knowledge_base:
         raise HTTPException(status_code=404, detail="Knowledge base not found")
     
-    documents = document_service.get_documents_by_knowledge_base(db, knowledge_base_id)
+    batch_size = settings.EXPORT_BATCH_SIZE
+    
+    def iter_documents():
+        cursor = None
+        while True:
+            query = keyset(
+                db.query(Document).filter(Document.knowledge_base_id == knowledge_base_id),
+                DOCUMENT_ORDER, cursor, batch_size
+            )
+            documents, cursor = page(query.all(), DOCUMENT_ORDER, batch_size)
+            for document in documents:
+                yield DocumentResponse.model_validate(document).model_dump_json() + "\n"
+            # Keep the identity map from growing with the export
+            db.expunge_all()
+            if cursor is None:
+                break
     
-    # Convert document IDs to strings
-    for i, doc in enumerate(documents):
-        documents[i] = prepare_document_for_response(doc)
-            
-    return documents
\ No newline at end of file
+    return StreamingResponse(iter_documents(), media_type="application/x-ndjson")
\ No newline at end of file
@@ -1,5 +1,5 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 from app.api import deps
@@ -7,20 +7,34 @@ from app.models.organization import Organization
 from app.models.user import User
 from app.schemas.organization import Organization as OrganizationSchema
 from app.schemas.organization import OrganizationCreate, OrganizationUpdate
+from app.utils.pagination import NEXT_CURSOR_HEADER, keyset, page
 
 router = APIRouter()
 
 @router.get("/", response_model=List[OrganizationSchema])
 def read_organizations(
+    response: Response,
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, deprecated=True),
     limit: int = 100,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Retrieve organizations.
+
+    Pass the X-Next-Cursor response header back as ``cursor`` for the next page.
     """
-    organizations = db.query(Organization).offset(skip).limit(limit).all()
+    order = (Organization.id,)
+    try:
+        query = keyset(db.query(Organization), order, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if skip and not cursor:
+        query = query.offset(skip)
+    organizations, next_cursor = page(query.all(), order, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return organizations
 
 @router.post("/", response_model=OrganizationSchema)
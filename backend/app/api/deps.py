@@ -1,15 +1,18 @@
-from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+from typing import AsyncGenerator, Generator, List, Optional
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.security import verify_password
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, get_async_sessionmaker
+from app.models.knowledge_base import KnowledgeBase
 from app.models.user import User
 from app.schemas.token import TokenPayload
+from app.utils.search_filters import DocumentFilters
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_PREFIX}/login/access-token"
@@ -22,6 +25,11 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Async session for handlers that query the database on the event loop"""
+    async with get_async_sessionmaker()() as db:
+        yield db
+
 def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
 ) -> User:
@@ -54,4 +62,48 @@ def get_current_active_superuser(
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
-    return current_user 
\ No newline at end of file
+    return current_user 
+
+def get_knowledge_base_scope(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Optional[List[int]]:
+    """Knowledge bases of the user's organization that searches are confined to; None for superusers.
+
+    The user's own documents outside any knowledge base are in scope too;
+    get_search_filters and get_scope_filters add them as ``owner_id``.
+    """
+    if current_user.is_superuser:
+        return None
+    rows = db.query(KnowledgeBase.id).filter(KnowledgeBase.organization_id == current_user.organization_id)
+    return [row.id for row in rows]
+
+def get_search_filters(
+    tags: Optional[List[str]] = Query(None),
+    tag_mode: str = "any",
+    category: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    knowledge_base_id: Optional[int] = None,
+    scope: Optional[List[int]] = Depends(get_knowledge_base_scope),
+    current_user: User = Depends(get_current_user),
+) -> DocumentFilters:
+    """Search filters from query parameters; repeat ``tags`` to match several tags"""
+    try:
+        return DocumentFilters(
+            tags=tags,
+            tag_mode=tag_mode,
+            category=category,
+            status=status_filter,
+            knowledge_base_id=knowledge_base_id,
+            knowledge_base_ids=scope,
+            owner_id=current_user.id if scope is not None else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def get_scope_filters(
+    scope: Optional[List[int]] = Depends(get_knowledge_base_scope),
+    current_user: User = Depends(get_current_user),
+) -> DocumentFilters:
+    """The tenant scope alone: the organization's knowledge bases plus the user's documents outside any"""
+    return DocumentFilters(knowledge_base_ids=scope, owner_id=current_user.id if scope is not None else None)
@@ -1,26 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.session import get_db
 from app.models.document import Document
-from app.schemas.document import DocumentCreate, DocumentRead
+from app.schemas.document import DocumentCreate, DocumentResponse
 from app.models.user import User
-from app.api.deps import get_current_user
+from app.api.deps import get_async_db, get_current_user
 import logging
 import traceback
 from app.core.logging import logger
 
 router = APIRouter()
 
-@router.post("/", response_model=DocumentRead)
+@router.post("/", response_model=DocumentResponse)
 async def create_document(
     document: DocumentCreate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     try:
         db_document = Document(
-            **document.dict(),
-            owner_id=current_user.id
+            **document.model_dump(),
+            user_id=current_user.id
         )
         db.add(db_document)
         await db.commit()
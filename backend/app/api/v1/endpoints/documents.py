@@ -1,18 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi import APIRouter, HTTPException, Depends, Body, Request, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-from pydantic import BaseModel # Ensure BaseModel is imported
-from app.services.document_service import DocumentService
-from app.services.scoring_service import ScoringService
-from app.services.simple_similarity_service import simple_similarity_service
+import asyncio
+from dataclasses import replace
+from pydantic import BaseModel, ValidationError # Ensure BaseModel is imported
+from app.core.config import settings
+from app.services import providers
+from app.services.scoring_executor import ScoringQueueFull
+from app.services.search_cache import search_cache, normalize_query, filters_key
+from app.utils.pagination import NEXT_CURSOR_HEADER, keyset, page
+from app.utils.search_filters import DocumentFilters
 from app.api import deps
 from app.models.user import User
-from app.schemas.document import DocumentCreate, DocumentUpdate, DocumentResponse as DocumentSchemaResponse, Document as DocumentSchema
+from app.schemas.document import DocumentCreate, DocumentUpdate, DocumentResponse as DocumentSchemaResponse, Document as DocumentSchema, NearDuplicate
 
 router = APIRouter()
-document_service = DocumentService()
-scoring_service = ScoringService()
 
 class SearchResponse(BaseModel):
     document_id: int
@@ -24,54 +29,163 @@ class SearchResponse(BaseModel):
 class SimilarDocumentsRequest(BaseModel):
     content: str
     n_results: int = 5
+    # Optional filters applied before ranking
+    tags: Optional[List[str]] = None
+    tag_mode: str = "any"
+    category: Optional[str] = None
+    status: Optional[str] = None
+    knowledge_base_id: Optional[int] = None
+
+class SimilarityMatrixRequest(BaseModel):
+    document_ids: List[int]
+
+class SimilarityMatrixResponse(BaseModel):
+    document_ids: List[int]  # rows and columns of the matrix, in request order
+    missing_ids: List[int]  # requested ids that are unknown or outside the user's scope
+    matrix: List[List[float]]
 
 @router.post("/{document_id}/similar", response_model=List[Dict[str, Any]])
 async def find_similar_documents(
     document_id: str,
     n_results: int = 5,
-    db: Session = Depends(deps.get_db),
-    current_user: Dict = Depends(deps.get_current_user)
+    filters: DocumentFilters = Depends(deps.get_search_filters),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Dict = Depends(deps.get_current_user),
+    simple_similarity_service=Depends(providers.get_simple_similarity_service),
+    neighbor_service=Depends(providers.get_neighbor_service)
 ):
-    """Find similar documents based on content."""
+    """Find similar documents based on content.
+
+    Served from the precomputed neighbor list when it is fresh and no filters beyond
+    the user's scope are given; otherwise ranked live.
+    """
     try:
-        document = simple_similarity_service.get_document(db, int(document_id))
-        if not document:
-            raise HTTPException(status_code=404, detail="Document not found")
+        async def compute():
+            if replace(filters, knowledge_base_ids=None).is_empty:
+                neighbors = await neighbor_service.get_async(db, int(document_id), n_results, filters)
+                if neighbors is not None:
+                    return neighbors
+                # Missing or stale lists are rebuilt by refresh_neighbors, not in the web worker
+            
+            document = await simple_similarity_service.get_document_async(db, int(document_id))
+            if not document:
+                raise HTTPException(status_code=404, detail="Document not found")
+            
+            return await simple_similarity_service.find_similar_documents_async(
+                db=db,
+                content=document['content'],
+                top_k=n_results,
+                filters=filters
+            )
         
-        similar_docs = simple_similarity_service.find_similar_documents(
-            db=db,
-            content=document['content'],
-            top_k=n_results
+        return await search_cache.get_or_compute(
+            "similar_to",
+            {"document_id": int(document_id), "top_k": n_results, "filters": filters_key(filters)},
+            compute
         )
-        return similar_docs
+    except HTTPException:
+        raise
+    except ScoringQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{doc1_id}/similarity/{doc2_id}", response_model=float)
 async def get_document_similarity(
-    doc1_id: str,
-    doc2_id: str,
-    db: Session = Depends(deps.get_db),
-    current_user: Dict = Depends(deps.get_current_user)
+    doc1_id: int,
+    doc2_id: int,
+    scope: DocumentFilters = Depends(deps.get_scope_filters),
+    db: AsyncSession = Depends(deps.get_async_db),
+    simple_similarity_service=Depends(providers.get_simple_similarity_service)
 ):
-    """Get similarity score between two documents."""
+    """Get the cosine similarity of two documents from their stored vectors."""
+    from app.models.document import Document as DocumentModel
+    # Out-of-scope ids look the same as unknown ones
+    visible = (await db.execute(
+        scope.apply(select(DocumentModel.id).where(DocumentModel.id.in_([doc1_id, doc2_id])))
+    )).scalars().all()
+    if len(set(visible)) < len({doc1_id, doc2_id}):
+        raise HTTPException(status_code=404, detail="Document not found")
     try:
-        similarity = simple_similarity_service.get_document_similarity_score(
+        similarity = await simple_similarity_service.get_document_similarity_score_async(
             db=db,
-            doc1_id=int(doc1_id),
-            doc2_id=int(doc2_id)
+            doc1_id=doc1_id,
+            doc2_id=doc2_id
         )
         return similarity
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/similarity-matrix", response_model=SimilarityMatrixResponse)
+async def get_similarity_matrix(
+    request: SimilarityMatrixRequest,
+    scope: DocumentFilters = Depends(deps.get_scope_filters),
+    db: AsyncSession = Depends(deps.get_async_db),
+    simple_similarity_service=Depends(providers.get_simple_similarity_service)
+):
+    """Pairwise cosine similarities of many documents, for duplicate detection and clustering jobs."""
+    document_ids = list(dict.fromkeys(request.document_ids))
+    if len(document_ids) > settings.SIMILARITY_MATRIX_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.SIMILARITY_MATRIX_MAX_DOCUMENTS} document ids per request"
+        )
+    from app.models.document import Document as DocumentModel
+    try:
+        if scope.knowledge_base_ids is not None and document_ids:
+            visible = set((await db.execute(
+                scope.apply(select(DocumentModel.id).where(DocumentModel.id.in_(document_ids)))
+            )).scalars())
+            document_ids = [document_id for document_id in document_ids if document_id in visible]
+        found, matrix = await simple_similarity_service.similarity_matrix_async(document_ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    found_set = set(found)
+    return SimilarityMatrixResponse(
+        document_ids=found,
+        missing_ids=[document_id for document_id in request.document_ids if document_id not in found_set],
+        matrix=matrix
+    )
+
+@router.get("/{document_id}/near-duplicates", response_model=List[NearDuplicate])
+def get_near_duplicates(
+    document_id: int,
+    threshold: Optional[float] = Query(None, ge=0.0, le=1.0),
+    scope: DocumentFilters = Depends(deps.get_scope_filters),
+    db: Session = Depends(deps.get_db),
+    duplicate_service=Depends(providers.get_duplicate_service)
+):
+    """Near-identical documents in the same knowledge base, found through MinHash LSH buckets."""
+    from app.models.document import Document as DocumentModel
+    document = db.query(DocumentModel).filter(DocumentModel.id == document_id).first()
+    if not document or not scope.allows(document):
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    duplicates = duplicate_service.find_duplicates_of(db, document_id, threshold)
+    if duplicates is None:
+        # Created before signatures were stored; build_minhash_index indexes it
+        return []
+    
+    titles = dict(
+        db.query(DocumentModel.id, DocumentModel.title)
+        .filter(DocumentModel.id.in_([duplicate["document_id"] for duplicate in duplicates]))
+        .all()
+    )
+    return [
+        NearDuplicate(title=titles.get(duplicate["document_id"]), **duplicate)
+        for duplicate in duplicates
+        if duplicate["document_id"] in titles
+    ]
+
 @router.post("/", response_model=DocumentSchemaResponse)
-async def create_document_endpoint(
+def create_document_endpoint(
     document_in: DocumentCreate,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: User = Depends(deps.get_current_user),
+    document_service=Depends(providers.get_document_service)
 ):
     """Create a new document, associate with knowledge base, and store its vector embedding."""
+    # Plain def: scoring, Milvus and the sync session run in FastAPI's threadpool
     try:
         created_document = document_service.create_document(
             db=db,
@@ -87,22 +201,86 @@ async def create_document_endpoint(
     except Exception as e:
         raise HTTPException(status_code=500, detail="An unexpected error occurred while creating the document.")
 
+@router.post("/bulk", response_model=Dict[str, Any])
+async def bulk_create_documents_endpoint(
+    request: Request,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+    document_service=Depends(providers.get_document_service)
+):
+    """Create documents from an NDJSON body with one DocumentCreate object per line."""
+    created_ids: List[int] = []
+    near_duplicates: Dict[str, List[Dict[str, Any]]] = {}
+    batch: List[Dict[str, Any]] = []
+    line_number = 0
+    buffer = b""
+    
+    async def flush_batch():
+        documents = await asyncio.to_thread(
+            document_service.bulk_create_documents, db, batch, current_user.id
+        )
+        created_ids.extend(doc.id for doc in documents)
+        near_duplicates.update((str(doc.id), doc.near_duplicates) for doc in documents if doc.near_duplicates)
+        batch.clear()
+    
+    async def handle_line(line: bytes):
+        nonlocal line_number
+        line_number += 1
+        if not line.strip():
+            return
+        try:
+            document_in = DocumentCreate.model_validate_json(line)
+        except ValidationError as ve:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid document on line {line_number} ({len(created_ids)} documents already created): {ve}"
+            )
+        batch.append(document_in.model_dump())
+        if len(batch) >= settings.BULK_INSERT_BATCH_SIZE:
+            await flush_batch()
+    
+    try:
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                await handle_line(line)
+        await handle_line(buffer)
+        if batch:
+            await flush_batch()
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{ve} ({len(created_ids)} documents already created)"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Bulk import failed after {len(created_ids)} documents: {str(e)}"
+        )
+    
+    # Only documents with near-duplicates are listed
+    return {"created": len(created_ids), "document_ids": created_ids, "near_duplicates": near_duplicates}
+
 @router.put("/{document_id}", response_model=DocumentSchemaResponse)
-async def update_document_endpoint(
+def update_document_endpoint(
     document_id: int,
     document_in: DocumentUpdate,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: User = Depends(deps.get_current_user),
+    document_service=Depends(providers.get_document_service)
 ):
-    """Update a document and recalculate its scores."""
+    """Update a document and recalculate its scores; fields left out keep their values."""
+    update_data = document_in.model_dump(exclude_unset=True, exclude_none=True)
     try:
         updated_document = document_service.update_document(
             db=db,
             document_id=document_id,
-            content=document_in.content,
-            title=document_in.title if document_in.title is not None else None,
-            knowledge_base_id=document_in.knowledge_base_id if document_in.knowledge_base_id is not None else None,
-            tags=document_in.tags if hasattr(document_in, 'tags') and document_in.tags is not None else None
+            content=update_data.pop("content", None),
+            tags=update_data.pop("tags", None),
+            **update_data
         )
         if not updated_document:
             raise HTTPException(status_code=404, detail="Document not found or update failed")
@@ -113,34 +291,54 @@ async def update_document_endpoint(
         raise HTTPException(status_code=500, detail="An unexpected error occurred while updating the document.")
 
 @router.delete("/{document_id}")
-async def delete_document(document_id: int, db: Session = Depends(deps.get_db)):
+def delete_document(
+    document_id: int,
+    db: Session = Depends(deps.get_db),
+    document_service=Depends(providers.get_document_service)
+):
     """Delete a document"""
     try:
-        # With no vector DB, we can rely on standard database operations
-        doc = db.query(Document).filter(Document.id == document_id).first()
-        if not doc:
-            raise HTTPException(status_code=404, detail="Document not found")
-        
-        db.delete(doc)
-        db.commit()
+        document_service.delete_document(db, document_id)
         return {"message": "Document deleted successfully"}
+    except ValueError as ve:
+        raise HTTPException(status_code=404, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/similar", response_model=List[Dict[str, Any]])
 async def find_similar_documents_by_content(
     request: SimilarDocumentsRequest,
-    db: Session = Depends(deps.get_db),
-    current_user: Dict = Depends(deps.get_current_user)
+    scope: Optional[List[int]] = Depends(deps.get_knowledge_base_scope),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Dict = Depends(deps.get_current_user),
+    simple_similarity_service=Depends(providers.get_simple_similarity_service)
 ):
     """Find similar documents based on content."""
     try:
-        similar_docs = simple_similarity_service.find_similar_documents(
-            db=db,
-            content=request.content,
-            top_k=request.n_results
+        filters = DocumentFilters(
+            tags=request.tags,
+            tag_mode=request.tag_mode,
+            category=request.category,
+            status=request.status,
+            knowledge_base_id=request.knowledge_base_id,
+            knowledge_base_ids=scope,
+            owner_id=current_user.id if scope is not None else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return await search_cache.get_or_compute(
+            "similar",
+            {"content": normalize_query(request.content), "top_k": request.n_results, "filters": filters_key(filters)},
+            lambda: simple_similarity_service.find_similar_documents_async(
+                db=db,
+                content=request.content,
+                top_k=request.n_results,
+                filters=filters
+            )
         )
-        return similar_docs
+    except ScoringQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -148,12 +346,52 @@ async def find_similar_documents_by_content(
 async def search_documents_endpoint(
     query: str,
     top_k: int = 5,
-    db: Session = Depends(deps.get_db)
+    mode: str = "ranked",
+    filters: DocumentFilters = Depends(deps.get_search_filters),
+    db: AsyncSession = Depends(deps.get_async_db),
+    document_service=Depends(providers.get_document_service),
+    simple_similarity_service=Depends(providers.get_simple_similarity_service)
 ):
-    """Search for similar documents with scoring."""
+    """Search for similar documents with scoring, with vector search when mode is "vector",
+    or with BM25 keyword ranking when mode is "lexical".
+
+    Filter by ``tags`` (repeatable, matched by ``tag_mode`` "any" or "all"), ``category``,
+    ``status`` and ``knowledge_base_id``; only matching documents are ranked. Results are
+    confined to the knowledge bases of the user's organization.
+    """
+    if mode not in ("ranked", "vector", "lexical"):
+        raise HTTPException(status_code=400, detail="mode must be 'ranked', 'vector' or 'lexical'")
+    # Repeated queries (search-as-you-type) are answered from the cache until the next write
+    cache_params = {"query": normalize_query(query), "top_k": top_k, "filters": filters_key(filters)}
     try:
+        if mode in ("vector", "lexical"):
+            # Both indexes return ids only; the other fields and snippets come from one database query
+            search = document_service.search_documents_async if mode == "vector" else document_service.search_lexical_async
+            hits = await search_cache.get_or_compute(
+                f"search_{mode}",
+                cache_params,
+                lambda: search(db, query, top_k, filters)
+            )
+            return [
+                DocumentSchemaResponse(
+                    id=str(hit['document_id']),
+                    title=hit['title'],
+                    content=hit['snippet'] or "",
+                    knowledge_base_id=hit.get('knowledge_base_id'),
+                    created_at=hit['created_at'],
+                    updated_at=hit['updated_at'],
+                    tags=hit['tags'],
+                    user_id=hit['user_id']
+                )
+                for hit in hits
+            ]
+        
         # Use find_similar_documents instead of the non-existent search_similar method
-        results = simple_similarity_service.find_similar_documents(db, query, top_k)
+        results = await search_cache.get_or_compute(
+            "search_ranked",
+            cache_params,
+            lambda: simple_similarity_service.find_similar_documents_async(db, query, top_k, filters)
+        )
         response_results = []
         for res_data in results:
             doc_id = res_data.get('document_id')
@@ -171,17 +409,20 @@ async def search_documents_endpoint(
                 user_id=str(res_data.get('user_id', 'N/A'))
             ))
         return response_results
+    except ScoringQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred during search: {str(e)}")
 
 @router.get("/{document_id}", response_model=DocumentSchemaResponse)
 async def get_document_endpoint(
     document_id: int,
-    db: Session = Depends(deps.get_db)
+    db: AsyncSession = Depends(deps.get_async_db),
+    simple_similarity_service=Depends(providers.get_simple_similarity_service)
 ):
     """Get a document by ID with its scores."""
     try:
-        doc_data = simple_similarity_service.get_document(db, document_id)
+        doc_data = await simple_similarity_service.get_document_async(db, document_id)
         if not doc_data:
             raise HTTPException(status_code=404, detail="Document not found")
         response = DocumentSchemaResponse(
@@ -202,12 +443,27 @@ async def get_document_endpoint(
 
 @router.get("/", response_model=List[DocumentSchemaResponse])
 async def list_documents(
-    db: Session = Depends(deps.get_db),
-    skip: int = 0,
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_db),
+    cursor: Optional[str] = None,
+    skip: int = Query(0, deprecated=True),
     limit: int = 100,
     current_user: User = Depends(deps.get_current_user)
 ):
-    """Retrieve all documents."""
+    """Retrieve the current user's documents, newest first; pass X-Next-Cursor back as cursor for the next page."""
     from app.models.document import Document as DocumentModel
-    documents = db.query(DocumentModel).filter(DocumentModel.user_id == current_user.id).offset(skip).limit(limit).all()
+    order = (DocumentModel.created_at, DocumentModel.id)
+    try:
+        statement = keyset(
+            select(DocumentModel).where(DocumentModel.user_id == current_user.id),
+            order, cursor, limit, descending=True
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if skip and not cursor:
+        statement = statement.offset(skip)
+    result = await db.execute(statement)
+    documents, next_cursor = page(result.scalars().all(), order, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return documents
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""Fill in the stored knowledge-quality and completeness scores of documents that have none.
+
+Run once after upgrading a database created before the scores were stored.
+Until then ranking computes them per query for those documents.
+
+Usage: python -m app.commands.backfill_scores [--batch-size N]
+"""
+import argparse
+import logging
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.document import Document
+from app.services.scoring_service import scoring_service
+
+logger = logging.getLogger(__name__)
+
+def backfill(batch_size: int) -> int:
+    """Score unscored documents in id order, committing once per batch; returns how many were scored"""
+    scored = 0
+    after_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            documents = (
+                db.query(Document)
+                .filter(Document.knowledge_quality_score.is_(None), Document.id > after_id)
+                .order_by(Document.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not documents:
+                break
+            scores = scoring_service.calculate_content_scores_batch([document.content or "" for document in documents])
+            for document, document_scores in zip(documents, scores):
+                document.knowledge_quality_score = document_scores['knowledge_quality_score']
+                document.completeness_score = document_scores['completeness_score']
+            db.commit()
+            scored += len(documents)
+            after_id = documents[-1].id
+            logger.info(f"Scored {scored} documents (up to id {after_id})")
+    finally:
+        db.close()
+    return scored
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill stored document scores")
+    parser.add_argument("--batch-size", type=int, default=settings.BULK_INSERT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    scored = backfill(args.batch_size)
+    logger.info(f"Done; scored {scored} documents")
+
+if __name__ == "__main__":
+    main()
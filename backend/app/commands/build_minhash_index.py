@@ -0,0 +1,59 @@
+"""Compute MinHash signatures and LSH buckets for documents that have none.
+
+Run once after upgrading, and again after changing MINHASH_NUM_PERM or
+MINHASH_BANDS (with --rebuild).
+
+Usage: python -m app.commands.build_minhash_index [--batch-size N] [--rebuild]
+"""
+import argparse
+import logging
+from sqlalchemy import delete
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.document import Document, DocumentLSHBand, DocumentMinHash
+from app.services.duplicate_service import duplicate_service
+
+logger = logging.getLogger(__name__)
+
+def build(batch_size: int, rebuild: bool = False) -> int:
+    """Index unindexed documents in id order, committing once per batch; returns how many were indexed"""
+    indexed = 0
+    after_id = 0
+    db = SessionLocal()
+    try:
+        if rebuild:
+            db.execute(delete(DocumentLSHBand))
+            db.execute(delete(DocumentMinHash))
+            db.commit()
+        while True:
+            documents = (
+                db.query(Document)
+                .outerjoin(DocumentMinHash, DocumentMinHash.document_id == Document.id)
+                .filter(DocumentMinHash.document_id.is_(None), Document.id > after_id)
+                .order_by(Document.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not documents:
+                break
+            duplicate_service.index_documents(db, documents)
+            db.commit()
+            indexed += len(documents)
+            after_id = documents[-1].id
+            logger.info(f"Indexed {indexed} documents (up to id {after_id})")
+    finally:
+        db.close()
+    return indexed
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the MinHash LSH index used for near-duplicate detection")
+    parser.add_argument("--batch-size", type=int, default=settings.BULK_INSERT_BATCH_SIZE)
+    parser.add_argument("--rebuild", action="store_true", help="drop all signatures and index every document")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    indexed = build(args.batch_size, args.rebuild)
+    logger.info(f"Done; indexed {indexed} documents")
+
+if __name__ == "__main__":
+    main()
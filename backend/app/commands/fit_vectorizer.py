@@ -0,0 +1,151 @@
+"""Fit the TF-IDF vectorizer on the whole corpus and re-embed the vector store.
+
+``--no-reembed`` only activates the new fit if its vocabulary, IDF weights
+and parameters are identical to the active version's, since stored vectors
+are only comparable with queries embedded the same way.
+
+Usage: python -m app.commands.fit_vectorizer [--batch-size N] [--no-reembed]
+"""
+from typing import Any, Iterator, Set, Tuple
+from datetime import datetime
+import argparse
+import logging
+import time
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.document import Document
+from app.utils.search_filters import vector_metadata
+from app.utils.text_processing import build_vectorizer, text_processor
+from app.utils.vectorizer_store import VectorizerStore
+
+logger = logging.getLogger(__name__)
+
+def stream_contents(db: Session, batch_size: int) -> Iterator[str]:
+    """Yield every document's content in id order, fetching batch_size rows at a time"""
+    rows = db.query(Document.content).order_by(Document.id).yield_per(batch_size)
+    for row in rows:
+        yield row.content or ""
+
+def fit(db: Session, batch_size: int):
+    """Fit vocabulary and IDF in a single streaming pass over the documents table"""
+    vectorizer = build_vectorizer()
+    # TfidfVectorizer consumes the iterable once, so the corpus is never held in memory
+    vectorizer.fit(stream_contents(db, batch_size))
+    return vectorizer
+
+# Content plus the filter fields stored with each vector
+REEMBED_COLUMNS = (
+    Document.id,
+    Document.content,
+    Document.knowledge_base_id,
+    Document.status,
+    Document.category,
+    Document.tags,
+    Document.user_id
+)
+
+def _reembed_batches(db: Session, vector_service, query, batch_size: int) -> Set[int]:
+    """Embed the documents selected by query into vector_service, returning their ids"""
+    seen = set()
+    batch, metadata = [], []
+    for row in query.yield_per(batch_size):
+        batch.append((row.id, row.content or ""))
+        metadata.append(vector_metadata(row))
+        seen.add(row.id)
+        if len(batch) >= batch_size:
+            vector_service.add_documents(batch, metadata)
+            batch, metadata = [], []
+    if batch:
+        vector_service.add_documents(batch, metadata)
+    return seen
+
+def catch_up(db: Session, vector_service, since: datetime, embedded: Set[int], batch_size: int) -> datetime:
+    """Re-embed documents written since ``since`` and drop deleted ones from the new collection.
+
+    ``embedded`` holds the ids in the collection and is kept up to date.
+    Returns when this pass started, the ``since`` of the next one.
+    """
+    started_at = datetime.utcnow()
+    changed = db.query(*REEMBED_COLUMNS).filter(Document.updated_at >= since)
+    changed_ids = [row.id for row in changed.with_entities(Document.id)]
+    for document_id in changed_ids:
+        vector_service.delete_document(document_id)
+    embedded |= _reembed_batches(db, vector_service, changed.order_by(Document.id), batch_size)
+
+    current_ids = {row.id for row in db.query(Document.id)}
+    for document_id in embedded - current_ids:
+        vector_service.delete_document(document_id)
+    embedded &= current_ids
+
+    vector_service.collection.flush()
+    logger.info(f"Caught up with {len(changed_ids)} documents written since {since.isoformat()}")
+    return started_at
+
+def reembed(db: Session, version: str, vectorizer, batch_size: int) -> Tuple[str, Any, Set[int], datetime]:
+    """Embed the corpus with the new vectorizer into a fresh collection.
+
+    Returns the collection name, its vector service, the embedded ids and the
+    start of the last catch-up pass, for the catch-up after activation.
+    """
+    # Imported here so the vector store is only contacted when re-embedding
+    from app.services.vector_service import VectorService
+
+    collection_name = f"{settings.MILVUS_COLLECTION_NAME}_{version.replace('-', '_')}"
+    text_processor.use_vectorizer(version, vectorizer, collection=collection_name)
+    vector_service = VectorService(collection_name=collection_name)
+
+    started_at = datetime.utcnow()
+    query = db.query(*REEMBED_COLUMNS).order_by(Document.id)
+    embedded = _reembed_batches(db, vector_service, query, batch_size)
+    logger.info(f"Embedded {len(embedded)} documents into {collection_name}")
+
+    # Catch up with writes made while the bulk pass was running
+    since = catch_up(db, vector_service, started_at, embedded, batch_size)
+    return collection_name, vector_service, embedded, since
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the TF-IDF vectorizer on the full document corpus")
+    parser.add_argument("--batch-size", type=int, default=settings.BULK_INSERT_BATCH_SIZE)
+    parser.add_argument(
+        "--no-reembed", action="store_true",
+        help="activate without re-embedding Milvus; refused unless the vocabulary and IDF weights are unchanged"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = VectorizerStore(settings.MODELS_DIR)
+    db = SessionLocal()
+    try:
+        vectorizer = fit(db, args.batch_size)
+        version = store.save(vectorizer)
+        metadata = {}
+        if args.no_reembed:
+            active = store.read_pointer()
+            active_digest = store.embedding_digest(active["version"]) if active else None
+            if active_digest is None or active_digest != store.embedding_digest(version):
+                # Queries would be embedded differently from the stored chunks
+                raise SystemExit(
+                    f"Saved version {version} but did not activate it: its vocabulary or IDF weights differ "
+                    "from the active version's, so the vector store must be re-embedded (run without --no-reembed)"
+                )
+            # Keep serving the collection embedded with the same vocabulary
+            if active.get("collection"):
+                metadata["collection"] = active["collection"]
+        else:
+            # Re-embed with the saved artifact so the collection matches what workers will load
+            collection_name, vector_service, embedded, since = reembed(
+                db, version, store.load(version), args.batch_size
+            )
+            metadata["collection"] = collection_name
+        # Workers switch vectorizer and collection together once this pointer is replaced
+        store.activate(version, **metadata)
+        if not args.no_reembed:
+            # Until each worker notices the pointer its writes still go to the old collection
+            time.sleep(settings.VECTORIZER_RELOAD_INTERVAL)
+            catch_up(db, vector_service, since, embedded, args.batch_size)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""Create missing tables and apply column and index changes to existing ones.
+
+Run before starting the server (start.sh does); safe to run repeatedly.
+
+Usage: python -m app.commands.migrate
+"""
+import logging
+from app.db.base import Base
+from app.db.migrations import upgrade
+from app.db.session import engine
+# Imported so their tables are registered on Base.metadata
+from app.models import document, knowledge_base, organization, user  # noqa: F401
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine)
+    upgrade(engine)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Report where time goes when importing the FastAPI app.
+
+Usage: python -m app.commands.profile_imports [--module app.main] [--top 25]
+"""
+from typing import List, Tuple
+import argparse
+import subprocess
+import sys
+import time
+
+# Packages that should only be loaded by the post-bind warm-up
+HEAVY_PACKAGES = ("spacy", "sklearn", "scipy", "pymilvus", "nltk", "textblob", "torch")
+
+def profile(module: str) -> Tuple[float, List[Tuple[int, int, str]]]:
+    """Import module in a fresh interpreter and return (wall seconds, [(self us, cumulative us, name)])"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return elapsed, entries
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile import time of the API")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    elapsed, entries = profile(args.module)
+    print(f"import {args.module}: {elapsed:.3f}s wall, {len(entries)} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for self_us, cumulative_us, name in sorted(entries, key=lambda e: e[1], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+
+    loaded = sorted({name.strip().split(".")[0] for _, _, name in entries} & set(HEAVY_PACKAGES))
+    if loaded:
+        print(f"\nHeavy packages imported eagerly: {', '.join(loaded)}")
+
+if __name__ == "__main__":
+    main()
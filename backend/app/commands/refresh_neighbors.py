@@ -0,0 +1,48 @@
+"""Recompute stale or missing "related documents" lists.
+
+Meant to run periodically (e.g. every minute from cron); this is the only place
+lists are built, so scoring never competes with request handling. Picks up lists
+invalidated by writes, documents that never had one, and lists built with an
+older vectorizer.
+
+Usage: python -m app.commands.refresh_neighbors [--batch-size N] [--limit N]
+"""
+import argparse
+import logging
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.neighbor_service import neighbor_service
+
+logger = logging.getLogger(__name__)
+
+def refresh_stale(batch_size: int, limit: int = 0) -> int:
+    """Refresh stale lists in id order, committing once per batch; returns how many were refreshed"""
+    refreshed = 0
+    after_id = 0
+    db = SessionLocal()
+    try:
+        while not limit or refreshed < limit:
+            size = batch_size if not limit else min(batch_size, limit - refreshed)
+            document_ids = neighbor_service.stale_document_ids(db, size, after_id)
+            if not document_ids:
+                break
+            refreshed += neighbor_service.refresh(db, document_ids)
+            db.commit()
+            after_id = document_ids[-1]
+            logger.info(f"Refreshed neighbors of {refreshed} documents (up to id {after_id})")
+    finally:
+        db.close()
+    return refreshed
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute stale related-document lists")
+    parser.add_argument("--batch-size", type=int, default=settings.NEIGHBORS_REFRESH_BATCH_SIZE)
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many documents (0 for all)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    refreshed = refresh_stale(args.batch_size, args.limit)
+    logger.info(f"Done; refreshed {refreshed} neighbor lists")
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,13 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # defaults to DATABASE_URL with the asyncpg driver
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a pooled connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements cached per connection
     
     # JWT
     SECRET_KEY: str
@@ -29,12 +36,63 @@ class Settings(BaseSettings):
     MILVUS_HOST: str = "milvus"
     MILVUS_PORT: str = "19530"
     MILVUS_COLLECTION_NAME: str = "documents"
+    VECTOR_CHUNK_SIZE: int = 256  # max words per indexed chunk
+    VECTOR_CHUNK_BATCH_SIZE: int = 64  # documents per nlp.pipe batch when chunking
+    VECTOR_CHUNK_FANOUT: int = 4  # chunk hits fetched per requested document
+    VECTOR_CHUNK_POOLING: str = "max"  # "max" or "sum" of chunk scores per document
+    SEARCH_SNIPPET_LENGTH: int = 300  # characters of content returned per vector search hit
+    
+    # Model Artifacts
+    MODELS_DIR: str = "/app/models"
+    VECTORIZER_RELOAD_INTERVAL: float = 30.0  # seconds between checks for a newly activated vectorizer
+    
+    # Similarity Index Settings
+    SIMILARITY_CANDIDATE_POOL: int = 50  # documents handed to the scorer per query
+    SIMILARITY_INDEX_BATCH_SIZE: int = 500  # rows embedded per batch when building
+    SIMILARITY_MATRIX_MAX_DOCUMENTS: int = 2000  # ids accepted by one similarity-matrix request
+
+    # Lexical Search Settings
+    LEXICAL_BM25_K1: float = 1.2  # term frequency saturation
+    LEXICAL_BM25_B: float = 0.75  # document length normalization
+    LEXICAL_INDEX_BATCH_SIZE: int = 1000  # rows streamed per batch when building
+    LEXICAL_COMPACT_RATIO: float = 0.2  # fraction of tombstoned postings that triggers a compaction
+    
+    # Bulk Ingestion Settings
+    BULK_INSERT_BATCH_SIZE: int = 500  # documents per transaction and vector insert
+    EXPORT_BATCH_SIZE: int = 500  # documents read per query when streaming an export
+    
+    # Tag Settings
+    TAG_CACHE_SIZE: int = 50000  # tag name -> id entries cached per process
+
+    # Search Result Cache Settings
+    RESULT_CACHE_SIZE: int = 2000  # cached search/similarity responses per process; 0 disables
+    RESULT_CACHE_TTL: float = 300.0  # seconds a cached response is served
+    RESULT_CACHE_REDIS_URL: Optional[str] = None  # shared tier and faster generation counter, e.g. redis://localhost:6379/0
+
+    # Related Documents Settings
+    NEIGHBORS_K: int = 20  # neighbors materialized per document
+    NEIGHBORS_REFRESH_BATCH_SIZE: int = 100  # documents recomputed per transaction by refresh_neighbors
+
+    # Near-Duplicate Detection Settings
+    MINHASH_NUM_PERM: int = 128  # signature length; changing it requires re-running build_minhash_index
+    MINHASH_BANDS: int = 16  # LSH bands; candidates above roughly (1/bands)**(bands/num_perm) similarity
+    MINHASH_SHINGLE_SIZE: int = 5  # words per shingle
+    NEAR_DUPLICATE_THRESHOLD: float = 0.8  # estimated Jaccard similarity flagged as a near-duplicate
+    
+    # Scoring Settings
+    SCORING_FEATURE_CACHE_SIZE: int = 10000  # in-memory spaCy feature entries
+    SCORING_FEATURE_CACHE_DIR: Optional[str] = None  # enables the on-disk tier when set
+    SCORING_BATCH_SIZE: int = 64  # texts per nlp.pipe batch
+    SCORING_N_PROCESS: int = 1  # spaCy worker processes per nlp.pipe call
+    SCORING_WORKERS: int = 2  # scoring executor processes; 0 scores in a thread instead
+    SCORING_MAX_PENDING: int = 32  # scoring calls queued or running before backpressure
+    SCORING_QUEUE_TIMEOUT: float = 5.0  # seconds to wait for a slot before returning 503
     
     # Legacy field to ensure backward compatibility
     CORS_ORIGINS: Optional[List[str]] = None
     
     # Health Check Settings
-    HEALTH_CHECK_INTERVAL: int = 30  # seconds
+    HEALTH_CHECK_INTERVAL: int = 30  # seconds between background polls of Milvus load and index progress
     HEALTH_CHECK_TIMEOUT: int = 5    # seconds
     
     class Config:
@@ -50,6 +108,15 @@ class Settings(BaseSettings):
             return [origin.strip() for origin in v.split(",") if origin.strip()]
         return v
 
+    def get_async_database_url(self) -> Optional[str]:
+        """Database URL for the asyncpg driver, or None when DATABASE_URL is not PostgreSQL"""
+        if self.ASYNC_DATABASE_URL:
+            return self.ASYNC_DATABASE_URL
+        scheme, _, rest = self.DATABASE_URL.partition("://")
+        if scheme.split("+")[0] in ("postgres", "postgresql"):
+            return f"postgresql+asyncpg://{rest}"
+        return None
+
     def get_cors_origins(self) -> List[str]:
         """Build the CORS origins list from individual settings"""
         origins = []
@@ -0,0 +1,81 @@
+"""Idempotent schema changes for databases created by an older release.
+
+``Base.metadata.create_all`` only creates missing tables; it never adds
+columns or indexes to tables that already exist. Those changes are listed
+here and applied by ``upgrade``, which is safe to run on every start.
+"""
+from typing import List, Tuple
+import logging
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Serializes upgrades when several processes start at once
+ADVISORY_LOCK_KEY = 720_431_001
+
+# Columns added to existing tables
+COLUMNS: List[str] = [
+    # Stored query-independent scores; NULL until backfill_scores or the next write fills them in
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS knowledge_quality_score DOUBLE PRECISION",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS completeness_score DOUBLE PRECISION",
+]
+
+# Data rewrites, each a no-op once applied
+DATA: List[str] = [
+    # Near-duplicate buckets of documents outside a knowledge base moved from a shared 0 to their owner
+    "UPDATE document_minhashes SET knowledge_base_id = -documents.user_id FROM documents "
+    "WHERE document_minhashes.document_id = documents.id AND document_minhashes.knowledge_base_id = 0 "
+    "AND documents.user_id IS NOT NULL",
+    "UPDATE document_lsh_bands SET knowledge_base_id = -documents.user_id FROM documents "
+    "WHERE document_lsh_bands.document_id = documents.id AND document_lsh_bands.knowledge_base_id = 0 "
+    "AND documents.user_id IS NOT NULL",
+]
+
+# (name, statement) of indexes added to existing tables, built without blocking writes
+INDEXES: List[Tuple[str, str]] = [
+    # Keyset pagination orders documents by (created_at, id), optionally within a user or knowledge base
+    ("ix_documents_created_at_id",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_documents_created_at_id ON documents (created_at, id)"),
+    ("ix_documents_user_id_created_at_id",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_documents_user_id_created_at_id ON documents (user_id, created_at, id)"),
+    ("ix_documents_knowledge_base_id_created_at_id",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_documents_knowledge_base_id_created_at_id "
+     "ON documents (knowledge_base_id, created_at, id)"),
+    # Search filters; tag filters cast the JSON column to jsonb, so the GIN index is on that expression
+    ("ix_documents_status", "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_documents_status ON documents (status)"),
+    ("ix_documents_category", "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_documents_category ON documents (category)"),
+    ("ix_documents_tags_gin",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_documents_tags_gin ON documents USING gin ((CAST(tags AS JSONB)))"),
+]
+
+def _drop_if_invalid(conn, name: str):
+    """Drop an index left invalid by an interrupted concurrent build, which IF NOT EXISTS would skip"""
+    invalid = conn.execute(
+        text(
+            "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+            "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+        ),
+        {"name": name}
+    ).first()
+    if invalid:
+        logger.warning(f"Dropping invalid index {name} before rebuilding it")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+def upgrade(engine: Engine):
+    """Apply every pending column, data and index change to a PostgreSQL database"""
+    if engine.dialect.name != "postgresql":
+        logger.info(f"Skipping schema upgrade on {engine.dialect.name}")
+        return
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.execution_options(isolation_level="AUTOCOMMIT").connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        try:
+            for statement in COLUMNS + DATA:
+                conn.execute(text(statement))
+            for name, statement in INDEXES:
+                _drop_if_invalid(conn, name)
+                conn.execute(text(statement))
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+    logger.info("Database schema is up to date")
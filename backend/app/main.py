@@ -3,13 +3,14 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.api_v1.api import api_router
-from app.db.session import engine
-from app.db.base import Base
+import asyncio
 import httpx
 from typing import Dict
 from app.api.v1.endpoints import documents, users
 from app.api.api_v1.endpoints import knowledge_bases
 from app.core.logging import logger
+from app.services.scoring_executor import scoring_executor
+from app.services import providers
 import time
 from fastapi.responses import JSONResponse
 import traceback
@@ -18,9 +19,6 @@ from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoin
 from starlette.requests import Request
 from starlette.responses import Response
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(title="SemaChain API")
 
 # Get the CORS origins from settings
@@ -33,7 +31,7 @@ app.add_middleware(
     allow_credentials=True,  # Allow cookies/auth headers
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Length", "X-Requested-With"],
+    expose_headers=["Content-Length", "X-Requested-With", "X-Next-Cursor"],
     max_age=600,
 )
 
@@ -67,6 +65,17 @@ app.include_router(documents.router, prefix="/api/v1/documents", tags=["document
 app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
 app.include_router(knowledge_bases.router, prefix="/api/v1/knowledge-bases", tags=["knowledge-bases"])
 
+@app.on_event("startup")
+async def start_warm_up():
+    # Not awaited, so the server binds and answers /health while models load;
+    # table creation and scoring workers are part of the warm-up
+    app.state.warm_up_task = asyncio.create_task(providers.warm_up())
+    app.state.vector_store_monitor = asyncio.create_task(providers.monitor_vector_store())
+
+@app.on_event("shutdown")
+def stop_scoring_executor():
+    scoring_executor.shutdown()
+
 # Add comprehensive error handling
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -89,7 +98,14 @@ async def root():
 # Add a health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    # Cached state only; monitor_vector_store polls Milvus in the background
+    vector_store = providers.get_vector_service().status()
+    return {
+        "status": "healthy",
+        "ready": providers.warm_up_state["status"] == "ready" and vector_store["ready"],
+        "warm_up": providers.warm_up_state,
+        "vector_store": vector_store
+    }
 
 # Add a debug endpoint to check CORS settings
 @app.get("/debug/cors")
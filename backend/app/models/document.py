@@ -1,10 +1,21 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, JSON, Float, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Text, JSON, Float, Boolean, Index, LargeBinary, Sequence, cast
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.base import Base
 
 class Document(Base):
     __tablename__ = "documents"
+    # Indexes and columns added after release are also listed in app/db/migrations.py for existing databases
+    __table_args__ = (
+        # Keyset pagination orders documents by (created_at, id), optionally within a user or knowledge base
+        Index("ix_documents_created_at_id", "created_at", "id"),
+        Index("ix_documents_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_documents_knowledge_base_id_created_at_id", "knowledge_base_id", "created_at", "id"),
+        # Equality filters on search
+        Index("ix_documents_status", "status"),
+        Index("ix_documents_category", "category"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
@@ -44,6 +55,10 @@ class Document(Base):
     has_attachments = Column(Boolean, default=False)
     has_comments = Column(Boolean, default=False)
     
+    # Query-independent scores, recomputed whenever the content is written
+    knowledge_quality_score = Column(Float, nullable=True)
+    completeness_score = Column(Float, nullable=True)
+    
     # Foreign Keys
     knowledge_base_id = Column(Integer, ForeignKey("knowledge_bases.id"))
     
@@ -60,6 +75,12 @@ class Document(Base):
     def __repr__(self):
         return f"<Document {self.id}: {self.title}>"
 
+# Tag filters cast the JSON column to jsonb, so the GIN index is on the same expression
+Index("ix_documents_tags_gin", cast(Document.tags, JSONB), postgresql_using="gin")
+
+# Bumped after every committed document write; keys the search result cache in all workers
+result_cache_generation = Sequence("result_cache_generation", metadata=Base.metadata)
+
 class DocumentAttachment(Base):
     __tablename__ = "document_attachments"
     
@@ -93,6 +114,41 @@ class DocumentTag(Base):
     document_id = Column(Integer, ForeignKey("documents.id"), primary_key=True)
     tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True)
 
+class DocumentNeighbors(Base):
+    """Materialized "related documents" list of one document"""
+    __tablename__ = "document_neighbors"
+    __table_args__ = (
+        # Finds the lists a changed document appears in
+        Index("ix_document_neighbors_neighbor_ids", "neighbor_ids", postgresql_using="gin"),
+    )
+
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    neighbors = Column(JSON, nullable=False)  # [{"id", "score", "scores"}], best first
+    neighbor_ids = Column(ARRAY(Integer), nullable=False)
+    vectorizer_version = Column(String(64))
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    stale = Column(Boolean, default=False, nullable=False)
+
+class DocumentMinHash(Base):
+    """MinHash signature of a document's shingles, for near-duplicate detection"""
+    __tablename__ = "document_minhashes"
+
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)  # little-endian uint32 array
+    knowledge_base_id = Column(Integer, nullable=False)  # minus the owner's id for documents outside a knowledge base
+
+class DocumentLSHBand(Base):
+    """One LSH band bucket of a document's signature; documents sharing a bucket are duplicate candidates"""
+    __tablename__ = "document_lsh_bands"
+    __table_args__ = (
+        Index("ix_document_lsh_bands_lookup", "knowledge_base_id", "band", "bucket"),
+    )
+
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    band = Column(Integer, primary_key=True)
+    bucket = Column(BigInteger, nullable=False)
+    knowledge_base_id = Column(Integer, nullable=False)
+
 # Add Comment model
 class Comment(Base):
     __tablename__ = "comments"
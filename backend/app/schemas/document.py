@@ -1,4 +1,4 @@
-from pydantic import BaseModel, field_serializer
+from pydantic import BaseModel, field_serializer, field_validator
 from typing import List, Dict, Any, Optional
 from .base import TimestampModel
 from datetime import datetime
@@ -30,11 +30,24 @@ class DocumentUpdate(DocumentBase):
     knowledge_base_id: Optional[int] = None
     tags: List[str]  # Ensure tags remain required even in updates
 
+class NearDuplicate(BaseModel):
+    document_id: int
+    similarity: float  # estimated Jaccard similarity of word shingles
+    title: Optional[str] = None
+
 class DocumentResponse(DocumentBase):
-    id: str
-    user_id: Optional[str] = None
+    # ORM ints are accepted as-is and serialized as strings, so callers never rewrite model ids
+    id: int | str
+    user_id: Optional[int | str] = None
     created_at: datetime
     updated_at: datetime
+    # Set on create when the knowledge base already holds near-identical documents
+    near_duplicates: List[NearDuplicate] = []
+
+    @field_validator('tags', mode='before')
+    @classmethod
+    def default_tags(cls, v: Optional[List[str]]) -> List[str]:
+        return v or []
 
     @field_serializer('id')
     def serialize_id_to_str(self, v: int | str) -> str:
@@ -49,6 +62,26 @@ class DocumentResponse(DocumentBase):
     class Config:
         from_attributes = True
 
+class DocumentSummary(BaseModel):
+    """Document fields for listings, without the content"""
+    id: int
+    title: str
+    tags: List[str] = []
+    created_at: datetime
+    updated_at: datetime
+
+    @field_validator('tags', mode='before')
+    @classmethod
+    def default_tags(cls, v: Optional[List[str]]) -> List[str]:
+        return v or []
+
+    @field_serializer('id')
+    def serialize_id_to_str(self, v: int) -> str:
+        return str(v)
+
+    class Config:
+        from_attributes = True
+
 class DocumentInDBBase(DocumentBase, TimestampModel):
     id: int
     knowledge_base_id: Optional[int] = None
@@ -61,6 +94,8 @@ class Document(DocumentInDBBase):
     # Now required with no default value
     tags: List[str]
     knowledge_base_info: Optional[Dict[str, Any]] = None
+    # Set on create when the knowledge base already holds near-identical documents
+    near_duplicates: List[NearDuplicate] = []
     
     # Add serializers to ensure consistent type handling
     @field_serializer('id')
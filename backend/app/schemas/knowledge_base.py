@@ -2,8 +2,8 @@ from pydantic import BaseModel, field_serializer
 from typing import Optional, List, Dict, Any
 from .base import TimestampModel
 from .user import User
-from .organization import Organization
-from .document import DocumentResponse
+from .organization import Organization, OrganizationInDBBase
+from .document import DocumentResponse, DocumentSummary
 
 class KnowledgeBaseBase(BaseModel):
     title: str
@@ -56,5 +56,12 @@ class KnowledgeBase(KnowledgeBaseInDBBase):
         
         return result
 
+# Listing entry: documents are projected without content and the organization without its users
+class KnowledgeBaseSummary(KnowledgeBaseInDBBase):
+    owner: User
+    organization: OrganizationInDBBase
+    documents_count: int = 0
+    documents: List[DocumentSummary] = []
+
 class KnowledgeBaseInDB(KnowledgeBaseInDBBase):
     pass
\ No newline at end of file
@@ -0,0 +1,122 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import logging
+import threading
+from pymilvus import Collection, utility
+
+logger = logging.getLogger(__name__)
+
+class CollectionState:
+    """Tracks whether a Milvus collection (or some of its partitions) is loaded.
+
+    Loading is a control-plane RPC, so it happens once, at warm-up or on the
+    first search, and afterwards searches only check an in-process flag.
+    ``refresh`` polls Milvus for load and index build progress and notices when
+    the collection was released or its index rebuilt behind our back, in which
+    case the next search loads it again.
+    """
+
+    def __init__(self, collection: Collection):
+        self.collection = collection
+        self.name = collection.name
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.loaded_partitions = set()
+        self.loaded_at: Optional[datetime] = None
+        self.load_progress: Optional[str] = None
+        self.index_progress: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self._index_params = None
+
+    def ensure_loaded(self, partition_names: Optional[List[str]] = None):
+        """Load the collection, or just the given partitions, unless already loaded"""
+        if self.loaded:
+            return
+        if partition_names is not None and all(name in self.loaded_partitions for name in partition_names):
+            return
+        with self._lock:
+            try:
+                if partition_names is None:
+                    if not self.loaded:
+                        self.collection.load()
+                        self.loaded = True
+                        self.loaded_at = datetime.utcnow()
+                        self._index_params = self._current_index_params()
+                        logger.info(f"Loaded Milvus collection {self.name}")
+                else:
+                    for name in partition_names:
+                        if name not in self.loaded_partitions:
+                            self.collection.partition(name).load()
+                            self.loaded_partitions.add(name)
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+                raise
+
+    def partition_created(self, name: str):
+        """Load a new partition straight away if the whole collection is meant to be loaded"""
+        if self.loaded:
+            self.collection.partition(name).load()
+
+    def release_partitions(self, names: List[str]):
+        """Release partitions; a fully loaded collection is then only partially loaded"""
+        with self._lock:
+            for name in names:
+                self.collection.partition(name).release()
+                self.loaded_partitions.discard(name)
+            if self.loaded:
+                self.loaded = False
+                self.loaded_partitions = {
+                    partition.name for partition in self.collection.partitions
+                    if partition.name not in names
+                }
+
+    def invalidate(self):
+        """Forget the load state so the next search loads again"""
+        with self._lock:
+            self.loaded = False
+            self.loaded_partitions = set()
+            self.loaded_at = None
+
+    def _current_index_params(self) -> Optional[Dict[str, Any]]:
+        indexes = self.collection.indexes
+        return dict(indexes[0].params) if indexes else None
+
+    def refresh(self):
+        """Poll Milvus for load and index progress and reconcile the local state"""
+        try:
+            self.index_progress = dict(utility.index_building_progress(self.name))
+            self.load_progress = utility.loading_progress(self.name).get("loading_progress")
+            if self.loaded and self.load_progress != "100%":
+                # Released elsewhere, or Milvus restarted and lost its in-memory segments
+                logger.warning(f"Milvus collection {self.name} is no longer loaded; reloading on next search")
+                self.invalidate()
+            elif self.loaded and self._current_index_params() != self._index_params:
+                logger.info(f"Index of Milvus collection {self.name} changed; reloading")
+                self.reload()
+            self.error = None
+        except Exception as e:
+            self.error = str(e)
+
+    def reload(self):
+        """Release and load again, e.g. after the vector index was rebuilt"""
+        self.invalidate()
+        self.collection.release()
+        self.ensure_loaded()
+
+    @property
+    def is_ready(self) -> bool:
+        return self.loaded or bool(self.loaded_partitions)
+
+    def status(self) -> Dict[str, Any]:
+        """Snapshot for the health endpoint"""
+        return {
+            "collection": self.name,
+            "ready": self.is_ready,
+            "loaded": self.loaded,
+            "loaded_partitions": sorted(self.loaded_partitions),
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "load_progress": self.load_progress,
+            "index_progress": self.index_progress,
+            "error": self.error
+        }
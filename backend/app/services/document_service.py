@@ -1,16 +1,29 @@
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-from app.services.vector_service import VectorService
+import asyncio
+from app.services.vector_service import vector_service
+from app.services.similarity_index import similarity_index
+from app.services.lexical_index import lexical_index
+from app.services.scoring_service import scoring_service
+from app.services.tag_service import tag_service
+from app.services.search_cache import search_cache
+from app.services.neighbor_service import neighbor_service
+from app.services.duplicate_service import duplicate_service
+from app.db.session import SessionLocal
 from app.models.document import Document, DocumentAttachment
+from app.utils.search_filters import DocumentFilters, scope_key, vector_metadata
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, case, func, select
+from app.core.config import settings
 import re
 from slugify import slugify
 from fastapi import HTTPException
 
 class DocumentService:
     def __init__(self):
-        self.vector_service = VectorService()
+        # Shared with the rest of the process so there is one Milvus connection
+        self.vector_service = vector_service
 
     def create_document(self, db: Session, content: str, user_id: int, title: str, knowledge_base_id: Optional[int] = None, tags: List[str] = None, **kwargs) -> Document:
         """Create a new document with enhanced organization features"""
@@ -31,6 +44,7 @@ class DocumentService:
         # Calculate document properties
         word_count = len(content.split())
         estimated_read_time = max(1, word_count // 200)  # Assuming 200 words per minute
+        content_scores = scoring_service.calculate_content_scores(content)
         
         # Create document
         document = Document(
@@ -44,16 +58,25 @@ class DocumentService:
             updated_at=datetime.utcnow(),
             knowledge_base_id=knowledge_base_id,  # Associate with knowledge base
             tags=tags,  # Store tags in the JSON column
+            **content_scores,
             **kwargs
         )
         
         # First add to database to get document ID
         db.add(document)
+        db.flush()
+        tag_service.set_document_tags(db, {document.id: tags})
+        # Flag near-identical documents already in the knowledge base, then index this one
+        signature = duplicate_service.signature(content)
+        near_duplicates = duplicate_service.find_near_duplicates(
+            db, signature, scope_key(knowledge_base_id, user_id), exclude_id=document.id
+        )
+        duplicate_service.index_documents(db, [document], [signature])
         db.commit()
         db.refresh(document)
         
         # Now add to vector store with the actual document ID
-        vector_id = self.vector_service.add_document(document.id, content)
+        vector_id = self.vector_service.add_document(document.id, content, vector_metadata(document))
         document.vector_id = vector_id
         
         # Update the document with the vector ID
@@ -61,18 +84,116 @@ class DocumentService:
         db.commit()
         db.refresh(document)
         
+        scope = scope_key(document.knowledge_base_id, document.user_id)
+        similarity_index.upsert(document.id, content, scope)
+        lexical_index.upsert(document.id, content, scope)
+        # Bump again now that the vector store and index include the document
+        search_cache.bump()
+        
+        # Not a column; returned with the created document so clients can warn about it
+        document.near_duplicates = near_duplicates
         return document
 
-    def update_document(self, db: Session, document_id: int, content: str, tags: List[str] = None, **kwargs) -> Document:
-        """Update a document with version control"""
+    def bulk_create_documents(self, db: Session, documents: List[Dict[str, Any]], user_id: int) -> List[Document]:
+        """Create many documents with one embedding pass, one vector insert and one transaction"""
+        if not documents:
+            return []
+        
+        for position, data in enumerate(documents):
+            if not data.get("tags"):
+                raise ValueError(f"At least one tag is required for the document (item {position})")
+        
+        contents = [data["content"] for data in documents]
+        slugs = self._unique_slugs(db, [data["title"] for data in documents])
+        content_scores = scoring_service.calculate_content_scores_batch(contents)
+        now = datetime.utcnow()
+        
+        created = []
+        for data, slug, scores in zip(documents, slugs, content_scores):
+            word_count = len(data["content"].split())
+            created.append(Document(
+                content=data["content"],
+                user_id=user_id,
+                title=data["title"],
+                slug=slug,
+                word_count=word_count,
+                estimated_read_time=max(1, word_count // 200),
+                created_at=now,
+                updated_at=now,
+                knowledge_base_id=data.get("knowledge_base_id"),
+                tags=data["tags"],
+                **scores
+            ))
+        
+        try:
+            # Flush to get document IDs without committing
+            db.add_all(created)
+            db.flush()
+            tag_service.set_document_tags(db, {doc.id: doc.tags for doc in created})
+            # Same near-duplicate check as create_document, for the whole batch at once
+            signatures = [duplicate_service.signature(doc.content) for doc in created]
+            duplicate_service.index_documents(db, created, signatures)
+            near_duplicates = duplicate_service.find_near_duplicates_many(db, created, signatures)
+            # Read before the commit expires the instances
+            contents = [(doc.id, doc.content) for doc in created]
+            metadata = [vector_metadata(doc) for doc in created]
+            entries = [(doc.id, doc.content, scope_key(doc.knowledge_base_id, doc.user_id)) for doc in created]
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        
+        # Only committed documents get vectors, as in create_document, so a failed commit leaves none behind
+        vector_ids = self.vector_service.add_documents(contents, metadata)
+        for document, vector_id in zip(created, vector_ids):
+            document.vector_id = vector_id
+        db.commit()
+        
+        similarity_index.upsert_many(entries)
+        lexical_index.upsert_many(entries)
+        search_cache.bump()
+        
+        for document in created:
+            document.near_duplicates = near_duplicates[document.id]
+        return created
+
+    def _unique_slugs(self, db: Session, titles: List[str]) -> List[str]:
+        """Generate unique slugs for a batch of titles with as few queries as possible"""
+        base_slugs = [slugify(title) for title in titles]
+        taken = set(
+            slug for (slug,) in db.query(Document.slug).filter(Document.slug.in_(set(base_slugs)))
+        )
+        # Only bases that already exist need their numbered variants loaded
+        for base_slug in taken.copy():
+            taken.update(
+                slug for (slug,) in db.query(Document.slug).filter(Document.slug.like(f"{base_slug}-%"))
+            )
+        
+        slugs = []
+        for base_slug in base_slugs:
+            slug = base_slug
+            counter = 1
+            while slug in taken:
+                slug = f"{base_slug}-{counter}"
+                counter += 1
+            taken.add(slug)
+            slugs.append(slug)
+        return slugs
+
+    def update_document(self, db: Session, document_id: int, content: Optional[str] = None, tags: List[str] = None, **kwargs) -> Document:
+        """Update a document with version control; content defaults to the current content"""
         document = db.query(Document).filter(Document.id == document_id).first()
         if not document:
             raise ValueError("Document not found")
+        if content is None:
+            content = document.content
         
         # Update content and properties
         document.content = content
         document.word_count = len(content.split())
         document.estimated_read_time = max(1, document.word_count // 200)
+        for key, value in scoring_service.calculate_content_scores(content).items():
+            setattr(document, key, value)
         document.updated_at = datetime.utcnow()
         document.version += 1
         
@@ -82,6 +203,7 @@ class DocumentService:
             if not tags:
                 raise ValueError("At least one tag is required for the document")
             document.tags = tags
+            tag_service.set_document_tags(db, {document.id: tags}, replace=True)
         
         # Update other properties if provided
         for key, value in kwargs.items():
@@ -89,13 +211,37 @@ class DocumentService:
                 setattr(document, key, value)
         
         # Update vector store
-        self.vector_service.update_document(document.vector_id, content)
+        self.vector_service.update_document(document.id, content, vector_metadata(document))
+        neighbor_service.invalidate(db, [document.id])
+        duplicate_service.index_documents(db, [document])
         
         db.commit()
         db.refresh(document)
         
+        scope = scope_key(document.knowledge_base_id, document.user_id)
+        similarity_index.upsert(document.id, content, scope)
+        lexical_index.upsert(document.id, content, scope)
+        search_cache.bump()
+        
         return document
 
+    def delete_document(self, db: Session, document_id: int) -> None:
+        """Delete a document from the database, the vector store and the in-memory indexes"""
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            raise ValueError("Document not found")
+        
+        tag_service.remove_document_tags(db, document_id)
+        # The document's own list goes with it (ON DELETE CASCADE); lists naming it go stale
+        neighbor_service.invalidate(db, [document_id])
+        db.delete(document)
+        db.commit()
+        
+        self.vector_service.delete_document(document_id)
+        similarity_index.remove(document_id)
+        lexical_index.remove(document_id)
+        search_cache.bump()
+
     def get_document_tree(self, db: Session, document_id: int) -> Dict[str, Any]:
         """Get document hierarchy"""
         document = db.query(Document).filter(Document.id == document_id).first()
@@ -192,9 +338,124 @@ class DocumentService:
                 
         return documents
 
-    def search_documents(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search documents using vector search"""
-        return self.vector_service.search_similar(query, top_k)
+    def search_documents(
+        self,
+        query: str,
+        top_k: int = 5,
+        db: Optional[Session] = None,
+        filters: Optional[DocumentFilters] = None
+    ) -> List[Dict[str, Any]]:
+        """Search documents using vector search.
+
+        When a session is given, Milvus returns only ids and distances and the
+        titles and snippets are loaded from the database in one query.
+        """
+        if db is None:
+            return self.vector_service.search_similar(query, top_k, filters=filters)
+        
+        hits = self.vector_service.search_similar(query, top_k, include_content=False, filters=filters)
+        return self._hydrate_search_hits(db, hits, filters)
+
+    async def search_documents_async(
+        self,
+        db: AsyncSession,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[DocumentFilters] = None
+    ) -> List[Dict[str, Any]]:
+        """Vector search with the Milvus call in a thread and hydration on an async session"""
+        hits = await asyncio.to_thread(self.vector_service.search_similar, query, top_k, False, filters)
+        if not hits:
+            return []
+        result = await db.execute(self._search_hits_statement(hits, filters))
+        return self._merge_search_hits(hits, result.all())
+
+    def _lexical_hits(self, query: str, top_k: int, filters: Optional[DocumentFilters] = None) -> List[Dict[str, Any]]:
+        """BM25 lookup with its own session, in case the index must be built or filters resolved"""
+        db = SessionLocal()
+        try:
+            lexical_index.ensure_built(db)
+            scopes, allowed_ids = None, None
+            if filters is not None:
+                # The tenant scope is checked inside the index; only attribute filters need Postgres
+                scopes = filters.scope_keys()
+                if filters.has_attribute_filters:
+                    allowed_ids = {row.id for row in filters.apply(db.query(Document.id))}
+            return [
+                {"document_id": document_id, "score": score, "chunk_offset": 0}
+                for document_id, score in lexical_index.search(query, top_k, scopes, allowed_ids)
+            ]
+        finally:
+            db.close()
+
+    async def search_lexical_async(
+        self,
+        db: AsyncSession,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[DocumentFilters] = None
+    ) -> List[Dict[str, Any]]:
+        """BM25 keyword search with the index lookup in a thread and hydration on an async session"""
+        hits = await asyncio.to_thread(self._lexical_hits, query, top_k, filters)
+        if not hits:
+            return []
+        result = await db.execute(self._search_hits_statement(hits, filters))
+        return self._merge_search_hits(hits, result.all())
+
+    def _hydrate_search_hits(
+        self,
+        db: Session,
+        hits: List[Dict[str, Any]],
+        filters: Optional[DocumentFilters] = None
+    ) -> List[Dict[str, Any]]:
+        """Attach titles and snippets of the matched chunks to vector search hits"""
+        if not hits:
+            return []
+        return self._merge_search_hits(hits, db.execute(self._search_hits_statement(hits, filters)).all())
+
+    def _search_hits_statement(self, hits: List[Dict[str, Any]], filters: Optional[DocumentFilters] = None):
+        """Select the display fields and snippets of all hits in one query"""
+        # Start each snippet at the matching chunk (SQL substrings are 1-based)
+        snippet_start = case(
+            {hit["document_id"]: (hit.get("chunk_offset") or 0) + 1 for hit in hits},
+            value=Document.id,
+            else_=1
+        )
+        statement = select(
+            Document.id,
+            Document.title,
+            Document.knowledge_base_id,
+            Document.user_id,
+            Document.tags,
+            Document.created_at,
+            Document.updated_at,
+            func.substr(Document.content, snippet_start, settings.SEARCH_SNIPPET_LENGTH).label("snippet")
+        ).where(Document.id.in_([hit["document_id"] for hit in hits]))
+        if filters is not None:
+            # Milvus already filtered the hits; this drops any whose metadata changed since they were embedded
+            statement = filters.apply(statement)
+        return statement
+
+    def _merge_search_hits(self, hits: List[Dict[str, Any]], rows) -> List[Dict[str, Any]]:
+        rows_by_id = {row.id: row for row in rows}
+        
+        results = []
+        for hit in hits:
+            row = rows_by_id.get(hit["document_id"])
+            if row is None:
+                # Deleted from the database but not yet from the vector store
+                continue
+            results.append({
+                **hit,
+                "title": row.title,
+                "snippet": row.snippet,
+                "knowledge_base_id": row.knowledge_base_id,
+                "user_id": row.user_id,
+                "tags": row.tags or [],
+                "created_at": row.created_at,
+                "updated_at": row.updated_at
+            })
+        return results
 
     def update_document_status(self, db: Session, document_id: int, status: str) -> Document:
         """Update document status (draft, review, published, archived)"""
@@ -205,10 +466,15 @@ class DocumentService:
         document.status = status
         if status == "published":
             document.published_at = datetime.utcnow()
+        neighbor_service.invalidate(db, [document.id])
             
         db.commit()
         db.refresh(document)
         
+        # Keep the filter fields stored with the vectors in step
+        self.vector_service.update_document(document.id, document.content, vector_metadata(document))
+        search_cache.bump()
+        
         return document
 
     def assign_to_knowledge_base(self, db: Session, document_id: int, knowledge_base_id: int) -> Document:
@@ -219,22 +485,28 @@ class DocumentService:
             
         document.knowledge_base_id = knowledge_base_id
         document.updated_at = datetime.utcnow()
+        neighbor_service.invalidate(db, [document.id])
+        # Duplicates are looked up per knowledge base
+        duplicate_service.index_documents(db, [document])
         
         db.commit()
         db.refresh(document)
         
+        self.vector_service.update_document(document.id, document.content, vector_metadata(document))
+        scope = scope_key(document.knowledge_base_id, document.user_id)
+        similarity_index.set_scope(document.id, scope)
+        lexical_index.set_scope(document.id, scope)
+        search_cache.bump()
+        
         return document
         
     def get_documents_by_knowledge_base(self, db: Session, knowledge_base_id: int) -> List[Document]:
         """Get all documents belonging to a specific knowledge base"""
-        documents = db.query(Document)\
+        # Missing tags are defaulted by the response schema rather than on the ORM objects
+        return db.query(Document)\
             .filter(Document.knowledge_base_id == knowledge_base_id)\
             .order_by(desc(Document.created_at))\
             .all()
-            
-        # Ensure all returned documents have tags as a list
-        for doc in documents:
-            if doc.tags is None:
-                doc.tags = []
-                
-        return documents
\ No newline at end of file
+
+# Create singleton instance
+document_service = DocumentService()
@@ -0,0 +1,147 @@
+from typing import Any, Dict, List, Optional, Sequence
+from collections import defaultdict
+import numpy as np
+from sqlalchemy import delete, insert, tuple_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.document import Document, DocumentLSHBand, DocumentMinHash
+from app.utils.minhash import MinHasher
+from app.utils.search_filters import scope_key
+
+class DuplicateService:
+    """Finds near-duplicate documents within a knowledge base through MinHash LSH.
+
+    Documents outside any knowledge base are only compared with other
+    documents of the same owner, so no lookup crosses a tenant boundary.
+
+    Every indexed document has its signature stored compactly and one row per
+    LSH band bucket. A lookup fetches only the documents sharing a bucket with
+    the query signature and verifies them against their stored signatures, so
+    it never scans the knowledge base.
+    """
+
+    def __init__(self, threshold: Optional[float] = None):
+        self.threshold = settings.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        self.hasher = MinHasher(
+            num_perm=settings.MINHASH_NUM_PERM,
+            bands=settings.MINHASH_BANDS,
+            shingle_size=settings.MINHASH_SHINGLE_SIZE
+        )
+
+    def signature(self, content: str) -> np.ndarray:
+        return self.hasher.signature(content or "")
+
+    def index_documents(self, db: Session, documents: Sequence[Document], signatures: Optional[List[np.ndarray]] = None):
+        """Store signatures and band buckets for documents without committing, replacing old ones"""
+        if not documents:
+            return
+        if signatures is None:
+            signatures = [self.signature(document.content) for document in documents]
+        document_ids = [document.id for document in documents]
+        db.execute(delete(DocumentLSHBand).where(DocumentLSHBand.document_id.in_(document_ids)))
+        db.execute(delete(DocumentMinHash).where(DocumentMinHash.document_id.in_(document_ids)))
+
+        minhash_rows, band_rows = [], []
+        for document, signature in zip(documents, signatures):
+            namespace = scope_key(document.knowledge_base_id, document.user_id)
+            minhash_rows.append({
+                "document_id": document.id,
+                "signature": self.hasher.to_bytes(signature),
+                "knowledge_base_id": namespace
+            })
+            band_rows.extend(
+                {"document_id": document.id, "band": band, "bucket": bucket, "knowledge_base_id": namespace}
+                for band, bucket in self.hasher.band_keys(signature)
+            )
+        db.execute(insert(DocumentMinHash), minhash_rows)
+        db.execute(insert(DocumentLSHBand), band_rows)
+
+    def find_near_duplicates(
+        self,
+        db: Session,
+        signature: np.ndarray,
+        namespace: int,
+        exclude_id: Optional[int] = None,
+        threshold: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Documents in the namespace (see scope_key) whose estimated Jaccard similarity reaches the threshold, best first"""
+        threshold = self.threshold if threshold is None else threshold
+        candidates = db.query(DocumentLSHBand.document_id).filter(
+            DocumentLSHBand.knowledge_base_id == namespace,
+            tuple_(DocumentLSHBand.band, DocumentLSHBand.bucket).in_(self.hasher.band_keys(signature))
+        ).distinct()
+        if exclude_id is not None:
+            candidates = candidates.filter(DocumentLSHBand.document_id != exclude_id)
+
+        rows = db.query(DocumentMinHash.document_id, DocumentMinHash.signature).filter(
+            DocumentMinHash.document_id.in_(candidates.scalar_subquery())
+        )
+        duplicates = []
+        for row in rows:
+            similarity = self.hasher.jaccard(signature, self.hasher.from_bytes(row.signature))
+            if similarity >= threshold:
+                duplicates.append({"document_id": row.document_id, "similarity": similarity})
+        return sorted(duplicates, key=lambda duplicate: duplicate["similarity"], reverse=True)
+
+    def find_near_duplicates_many(
+        self,
+        db: Session,
+        documents: Sequence[Document],
+        signatures: List[np.ndarray],
+        threshold: Optional[float] = None
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """Near-duplicates of several already indexed documents with two queries, keyed by document id.
+
+        Documents of the same batch count as duplicates of each other.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        results = {document.id: [] for document in documents}
+        wanted = defaultdict(set)  # (namespace, band, bucket) -> documents with that bucket
+        for document, signature in zip(documents, signatures):
+            namespace = scope_key(document.knowledge_base_id, document.user_id)
+            for band, bucket in self.hasher.band_keys(signature):
+                wanted[(namespace, band, bucket)].add(document.id)
+        if not wanted:
+            return results
+
+        rows = db.query(
+            DocumentLSHBand.document_id, DocumentLSHBand.knowledge_base_id, DocumentLSHBand.band, DocumentLSHBand.bucket
+        ).filter(
+            tuple_(DocumentLSHBand.knowledge_base_id, DocumentLSHBand.band, DocumentLSHBand.bucket).in_(list(wanted))
+        )
+        candidates = defaultdict(set)
+        for row in rows:
+            for document_id in wanted[(row.knowledge_base_id, row.band, row.bucket)]:
+                if row.document_id != document_id:
+                    candidates[document_id].add(row.document_id)
+        if not candidates:
+            return results
+
+        stored = {
+            row.document_id: self.hasher.from_bytes(row.signature)
+            for row in db.query(DocumentMinHash.document_id, DocumentMinHash.signature).filter(
+                DocumentMinHash.document_id.in_(set().union(*candidates.values()))
+            )
+        }
+        signatures_by_id = {document.id: signature for document, signature in zip(documents, signatures)}
+        for document_id, candidate_ids in candidates.items():
+            duplicates = []
+            for candidate_id in candidate_ids:
+                similarity = self.hasher.jaccard(signatures_by_id[document_id], stored[candidate_id])
+                if similarity >= threshold:
+                    duplicates.append({"document_id": candidate_id, "similarity": similarity})
+            results[document_id] = sorted(duplicates, key=lambda duplicate: duplicate["similarity"], reverse=True)
+        return results
+
+    def find_duplicates_of(self, db: Session, document_id: int, threshold: Optional[float] = None) -> Optional[List[Dict[str, Any]]]:
+        """Near-duplicates of an indexed document, or None if it has no signature yet"""
+        stored = db.query(DocumentMinHash).filter(DocumentMinHash.document_id == document_id).first()
+        if stored is None:
+            return None
+        return self.find_near_duplicates(
+            db, self.hasher.from_bytes(stored.signature), stored.knowledge_base_id,
+            exclude_id=document_id, threshold=threshold
+        )
+
+# Create singleton instance
+duplicate_service = DuplicateService()
@@ -0,0 +1,262 @@
+from typing import Collection, Dict, List, Optional, Iterable, Tuple
+from collections import Counter
+import heapq
+import math
+import re
+import threading
+import logging
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.document import Document
+from app.utils.postings import PostingList
+from app.utils.search_filters import scope_key
+
+logger = logging.getLogger(__name__)
+
+# Same token pattern as the TF-IDF vectorizer, so both modes see the same words
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall((text or "").lower()) if token not in ENGLISH_STOP_WORDS]
+
+class LexicalIndex:
+    """In-process inverted index for BM25 keyword search.
+
+    Documents get increasing ordinals, so every posting list stays sorted and
+    compressed by appending. Updating a document indexes it under a new ordinal
+    and tombstones the old one; document frequencies and lengths count only
+    live documents, and the postings are compacted once enough are tombstoned.
+    Queries are ranked document-at-a-time with MaxScore pruning, skipping
+    documents outside the requested scope keys by their ordinal.
+    """
+
+    def __init__(self, k1: Optional[float] = None, b: Optional[float] = None):
+        self.k1 = settings.LEXICAL_BM25_K1 if k1 is None else k1
+        self.b = settings.LEXICAL_BM25_B if b is None else b
+        self._lock = threading.RLock()
+        self._built = False
+        self._reset()
+
+    def _reset(self):
+        self._term_ids: Dict[str, int] = {}
+        self._postings: List[PostingList] = []
+        self._df: List[int] = []  # live documents containing each term
+        self._doc_ids: List[Optional[int]] = []  # ordinal -> document id, None once tombstoned
+        self._lengths: List[int] = []  # ordinal -> token count
+        self._scopes: List[int] = []  # ordinal -> scope key (see scope_key)
+        self._doc_terms: Dict[int, List[int]] = {}  # live ordinal -> its distinct term ids
+        self._ordinals: Dict[int, int] = {}  # document id -> live ordinal
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._ordinals)
+
+    @property
+    def is_built(self) -> bool:
+        return self._built
+
+    def build(self, db: Session, batch_size: Optional[int] = None):
+        """(Re)build the index by streaming every document from the database"""
+        batch_size = batch_size or settings.LEXICAL_INDEX_BATCH_SIZE
+        with self._lock:
+            self._reset()
+            rows = (
+                db.query(Document.id, Document.content, Document.knowledge_base_id, Document.user_id)
+                .order_by(Document.id)
+                .yield_per(batch_size)
+            )
+            for row in rows:
+                self._add(row.id, row.content, scope_key(row.knowledge_base_id, row.user_id))
+            self._built = True
+            logger.info(f"Built lexical index with {len(self._ordinals)} documents and {len(self._term_ids)} terms")
+
+    def ensure_built(self, db: Session):
+        """Build the index on first use"""
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build(db)
+
+    def _add(self, document_id: int, content: str, scope: int):
+        counts = Counter(tokenize(content))
+        length = sum(counts.values())
+        ordinal = len(self._doc_ids)
+        self._doc_ids.append(document_id)
+        self._lengths.append(length)
+        self._scopes.append(scope)
+        self._ordinals[document_id] = ordinal
+        self._total_length += length
+
+        term_ids = []
+        for term, tf in counts.items():
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                term_id = len(self._postings)
+                self._term_ids[term] = term_id
+                self._postings.append(PostingList())
+                self._df.append(0)
+            self._postings[term_id].append(ordinal, tf, length)
+            self._df[term_id] += 1
+            term_ids.append(term_id)
+        self._doc_terms[ordinal] = term_ids
+
+    def _tombstone(self, document_id: int) -> bool:
+        ordinal = self._ordinals.pop(document_id, None)
+        if ordinal is None:
+            return False
+        self._doc_ids[ordinal] = None
+        self._total_length -= self._lengths[ordinal]
+        for term_id in self._doc_terms.pop(ordinal):
+            self._df[term_id] -= 1
+        return True
+
+    def _maybe_compact(self):
+        """Renumber live documents and drop tombstoned postings once they make up too much of the index"""
+        tombstoned = len(self._doc_ids) - len(self._ordinals)
+        if tombstoned == 0 or tombstoned < settings.LEXICAL_COMPACT_RATIO * len(self._doc_ids):
+            return
+        remap = {}
+        doc_ids, lengths, scopes, doc_terms = [], [], [], {}
+        for ordinal, document_id in enumerate(self._doc_ids):
+            if document_id is None:
+                continue
+            remap[ordinal] = len(doc_ids)
+            doc_terms[len(doc_ids)] = self._doc_terms[ordinal]
+            doc_ids.append(document_id)
+            lengths.append(self._lengths[ordinal])
+            scopes.append(self._scopes[ordinal])
+        self._postings = [postings.remapped(remap.get, lengths.__getitem__) for postings in self._postings]
+        self._doc_ids, self._lengths, self._doc_terms = doc_ids, lengths, doc_terms
+        self._scopes = scopes
+        self._ordinals = {document_id: ordinal for ordinal, document_id in enumerate(doc_ids)}
+        logger.info(f"Compacted lexical index, dropping {tombstoned} tombstoned documents")
+
+    def upsert(self, document_id: int, content: str, scope: int):
+        """Add or replace a single document"""
+        self.upsert_many([(document_id, content, scope)])
+
+    def upsert_many(self, documents: Iterable[Tuple[int, str, int]]):
+        """Add or replace several (document_id, content, scope)"""
+        if not self._built:
+            # The documents are picked up when the index is first built
+            return
+        with self._lock:
+            for document_id, content, scope in documents:
+                self._tombstone(document_id)
+                self._add(document_id, content, scope)
+            self._maybe_compact()
+
+    def set_scope(self, document_id: int, scope: int):
+        """Move an indexed document to another knowledge base or owner without re-indexing it"""
+        with self._lock:
+            ordinal = self._ordinals.get(document_id)
+            if ordinal is not None:
+                self._scopes[ordinal] = scope
+
+    def remove(self, document_id: int):
+        with self._lock:
+            if self._tombstone(document_id):
+                self._maybe_compact()
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        scopes: Optional[Collection[int]] = None,
+        allowed_ids: Optional[Collection[int]] = None
+    ) -> List[Tuple[int, float]]:
+        """Return up to ``top_k`` (document_id, BM25 score) pairs, best first.
+
+        Only documents whose scope key is in ``scopes`` and, when given, in
+        ``allowed_ids`` are scored.
+
+        Terms are ordered by their score upper bound. Once the k-th best score
+        exceeds the summed bounds of the lowest terms, those terms can no longer
+        produce a result by themselves: candidates come only from the remaining
+        terms, and the low ones are probed (skipping whole blocks) only while
+        they could still lift a candidate into the top k.
+        """
+        if top_k <= 0:
+            return []
+        with self._lock:
+            live = len(self._ordinals)
+            if live == 0:
+                return []
+            average_length = self._total_length / live or 1.0
+            k1, b = self.k1, self.b
+            lengths, doc_ids = self._lengths, self._doc_ids
+            document_scopes = self._scopes
+            if scopes is not None:
+                scopes = set(scopes)
+
+            terms = []
+            for term in dict.fromkeys(tokenize(query)):
+                term_id = self._term_ids.get(term)
+                if term_id is None or self._df[term_id] == 0:
+                    continue
+                df = self._df[term_id]
+                idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+                postings = self._postings[term_id]
+                # BM25 grows with tf and shrinks with document length, so this bounds every posting
+                upper = idf * postings.max_tf * (k1 + 1) / (
+                    postings.max_tf + k1 * (1 - b + b * postings.min_length / average_length)
+                )
+                terms.append((upper, idf, postings.cursor()))
+            if not terms:
+                return []
+            terms.sort(key=lambda term: term[0])
+            bounds = []  # bounds[i]: best possible score from terms[0..i] together
+            total = 0.0
+            for upper, _, _ in terms:
+                total += upper
+                bounds.append(total)
+
+            def term_score(idf: float, tf: int, ordinal: int) -> float:
+                return idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[ordinal] / average_length))
+
+            top: List[Tuple[float, int]] = []  # min-heap of (score, ordinal)
+            threshold = 0.0
+            first_essential = 0
+            while True:
+                while first_essential < len(terms) and bounds[first_essential] <= threshold:
+                    first_essential += 1
+                essential = terms[first_essential:]
+                candidate = min((cursor.doc for _, _, cursor in essential if cursor.doc is not None), default=None)
+                if candidate is None:
+                    break
+
+                document_id = doc_ids[candidate]
+                skip = (
+                    document_id is None
+                    or (scopes is not None and document_scopes[candidate] not in scopes)
+                    or (allowed_ids is not None and document_id not in allowed_ids)
+                )
+                score = 0.0
+                for _, idf, cursor in essential:
+                    if cursor.doc == candidate:
+                        if not skip:
+                            score += term_score(idf, cursor.tf, candidate)
+                        cursor.next()
+                if skip:
+                    continue
+
+                for i in range(first_essential - 1, -1, -1):
+                    if score + bounds[i] <= threshold:
+                        break
+                    _, idf, cursor = terms[i]
+                    cursor.advance(candidate)
+                    if cursor.doc == candidate:
+                        score += term_score(idf, cursor.tf, candidate)
+
+                if len(top) < top_k:
+                    heapq.heappush(top, (score, candidate))
+                elif score > top[0][0]:
+                    heapq.heapreplace(top, (score, candidate))
+                if len(top) == top_k:
+                    threshold = top[0][0]
+
+            return [(doc_ids[ordinal], score) for score, ordinal in sorted(top, reverse=True)]
+
+# Create singleton instance
+lexical_index = LexicalIndex()
@@ -0,0 +1,173 @@
+from typing import Any, Dict, Iterable, List, Optional
+from datetime import datetime
+from sqlalchemy import or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.document import Document, DocumentNeighbors
+from app.models.knowledge_base import KnowledgeBase
+from app.models.user import User
+from app.services.simple_similarity_service import simple_similarity_service
+from app.utils.search_filters import DocumentFilters
+from app.utils.text_processing import text_processor
+
+class NeighborService:
+    """Materialized top-k "related documents" lists.
+
+    Each document's ranked neighbors are stored in one row, so serving them is
+    a primary-key lookup plus one query for the neighbors' fields. A row is
+    stale once the document changes, once a document it lists changes or is
+    deleted, or once a different vectorizer is active; stale rows are served
+    live until ``refresh_neighbors`` recomputes them, outside the web workers.
+    """
+
+    def __init__(self, k: Optional[int] = None):
+        self.k = k or settings.NEIGHBORS_K
+
+    def _organization_scope(self, db: Session, document: Document) -> List[int]:
+        """Knowledge bases of the document's organization, which its neighbors are drawn from"""
+        if document.knowledge_base_id is not None:
+            organization_id = select(KnowledgeBase.organization_id).where(
+                KnowledgeBase.id == document.knowledge_base_id
+            ).scalar_subquery()
+        else:
+            organization_id = select(User.organization_id).where(User.id == document.user_id).scalar_subquery()
+        rows = db.query(KnowledgeBase.id).filter(KnowledgeBase.organization_id == organization_id)
+        return [row.id for row in rows]
+
+    def compute(self, db: Session, document: Document) -> List[Dict[str, Any]]:
+        """Rank the document's neighbors the same way the live similar-documents endpoint does"""
+        # The owner's documents outside any knowledge base are candidates too
+        filters = DocumentFilters(knowledge_base_ids=self._organization_scope(db, document), owner_id=document.user_id)
+        # One extra because the document is its own nearest neighbor
+        ranked = simple_similarity_service.find_similar_documents(db, document.content or "", self.k + 1, filters)
+        return [
+            {"id": doc["document_id"], "score": 1.0 - doc["distance"], "scores": doc["scores"]}
+            for doc in ranked
+            if doc["document_id"] != document.id
+        ][:self.k]
+
+    def refresh(self, db: Session, document_ids: Iterable[int], changed: Optional[bool] = None) -> int:
+        """Recompute and store neighbor lists without committing; returns how many were written.
+
+        ``changed`` means the documents themselves were written since their list
+        was built, so lists of their new neighbors are marked stale too. By default
+        it is worked out per document from the stored list's ``computed_at``.
+        """
+        documents = db.query(Document).filter(Document.id.in_(list(document_ids))).all()
+        computed_at = dict(
+            db.query(DocumentNeighbors.document_id, DocumentNeighbors.computed_at)
+            .filter(DocumentNeighbors.document_id.in_([document.id for document in documents]))
+            .all()
+        )
+        now = datetime.utcnow()
+        version = text_processor.vectorizer_version
+        for document in documents:
+            document_changed = changed
+            if document_changed is None:
+                previous = computed_at.get(document.id)
+                document_changed = previous is None or (document.updated_at is not None and previous < document.updated_at)
+            neighbors = self.compute(db, document)
+            values = {
+                "neighbors": neighbors,
+                "neighbor_ids": [neighbor["id"] for neighbor in neighbors],
+                "vectorizer_version": version,
+                "computed_at": now,
+                "stale": False
+            }
+            db.execute(
+                pg_insert(DocumentNeighbors)
+                .values(document_id=document.id, **values)
+                .on_conflict_do_update(index_elements=[DocumentNeighbors.document_id], set_=values)
+            )
+            if document_changed:
+                # Similarity is roughly symmetric, so the document may now belong in its neighbors' lists
+                self.invalidate(db, values["neighbor_ids"], include_listing=False)
+        return len(documents)
+
+    def invalidate(self, db: Session, document_ids: List[int], include_listing: bool = True):
+        """Mark the documents' own lists stale, and by default every list they appear in"""
+        if not document_ids:
+            return
+        condition = DocumentNeighbors.document_id.in_(document_ids)
+        if include_listing:
+            # Array overlap is served by the GIN index on neighbor_ids
+            condition = or_(condition, DocumentNeighbors.neighbor_ids.overlap(document_ids))
+        db.execute(
+            update(DocumentNeighbors)
+            .where(condition, DocumentNeighbors.stale.is_(False))
+            .values(stale=True)
+            .execution_options(synchronize_session=False)
+        )
+
+    def stale_document_ids(self, db: Session, limit: int, after_id: int = 0) -> List[int]:
+        """Ids of documents whose list is missing, marked stale or built with another vectorizer"""
+        statement = (
+            select(Document.id)
+            .outerjoin(DocumentNeighbors, DocumentNeighbors.document_id == Document.id)
+            .where(
+                Document.id > after_id,
+                or_(
+                    DocumentNeighbors.document_id.is_(None),
+                    DocumentNeighbors.stale.is_(True),
+                    DocumentNeighbors.vectorizer_version.is_distinct_from(text_processor.vectorizer_version),
+                    DocumentNeighbors.computed_at < Document.updated_at
+                )
+            )
+            .order_by(Document.id)
+            .limit(limit)
+        )
+        return list(db.execute(statement).scalars())
+
+    async def get_async(
+        self,
+        db: AsyncSession,
+        document_id: int,
+        top_k: int,
+        filters: Optional[DocumentFilters] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Serve a fresh stored list in the similar-documents format, or None if it must be computed live"""
+        if top_k > self.k:
+            return None
+        row = (await db.execute(
+            select(DocumentNeighbors, Document.updated_at)
+            .join(Document, Document.id == DocumentNeighbors.document_id)
+            .where(DocumentNeighbors.document_id == document_id)
+        )).first()
+        if row is None:
+            return None
+        entry, updated_at = row
+        if (
+            entry.stale
+            or entry.vectorizer_version != text_processor.vectorizer_version
+            or (updated_at is not None and entry.computed_at < updated_at)
+        ):
+            return None
+
+        statement = select(Document.id, Document.title, Document.content).where(
+            Document.id.in_(entry.neighbor_ids)
+        )
+        if filters is not None:
+            # Drops neighbors outside the requesting user's knowledge bases
+            statement = filters.apply(statement)
+        rows_by_id = {row.id: row for row in (await db.execute(statement)).all()}
+
+        results = []
+        for neighbor in entry.neighbors:
+            row = rows_by_id.get(neighbor["id"])
+            if row is None:
+                continue
+            results.append({
+                'document_id': row.id,
+                'title': row.title,
+                'content': row.content,
+                'distance': 1.0 - neighbor["score"],
+                'scores': neighbor["scores"]
+            })
+            if len(results) == top_k:
+                break
+        return results
+
+# Create singleton instance
+neighbor_service = NeighborService()
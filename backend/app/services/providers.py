@@ -0,0 +1,122 @@
+"""Lazy providers for the heavyweight service singletons.
+
+Routers depend on these getters instead of importing service modules at
+import time, so importing ``app.main`` does not load spaCy, scikit-learn or
+pymilvus. ``warm_up`` loads everything concurrently once the server is up.
+"""
+from typing import Any, Awaitable, Callable, Dict
+from functools import lru_cache, partial
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def get_text_processor():
+    from app.utils.text_processing import text_processor
+    return text_processor
+
+@lru_cache(maxsize=None)
+def get_scoring_service():
+    from app.services.scoring_service import scoring_service
+    return scoring_service
+
+@lru_cache(maxsize=None)
+def get_vector_service():
+    from app.services.vector_service import vector_service
+    return vector_service
+
+@lru_cache(maxsize=None)
+def get_document_service():
+    from app.services.document_service import document_service
+    return document_service
+
+@lru_cache(maxsize=None)
+def get_simple_similarity_service():
+    from app.services.simple_similarity_service import simple_similarity_service
+    return simple_similarity_service
+
+@lru_cache(maxsize=None)
+def get_duplicate_service():
+    from app.services.duplicate_service import duplicate_service
+    return duplicate_service
+
+@lru_cache(maxsize=None)
+def get_neighbor_service():
+    from app.services.neighbor_service import neighbor_service
+    return neighbor_service
+
+def _create_tables():
+    from app.db.base import Base
+    from app.db.migrations import upgrade
+    from app.db.session import engine
+    Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist; a no-op once start.sh has run the migrations
+    upgrade(engine)
+
+def _warm_text_processor():
+    get_text_processor().warm_up()
+
+def _warm_scoring_service():
+    get_scoring_service().warm_up()
+
+def _warm_vector_service():
+    # Connects to Milvus, creates the collection if needed and loads it once
+    get_vector_service().warm_up()
+
+def _warm_similarity_service():
+    get_document_service()
+    get_simple_similarity_service()
+
+# Blocking warm-up steps, run concurrently in threads
+WARM_UP_STEPS: Dict[str, Callable[[], Any]] = {
+    "database": _create_tables,
+    "text_processor": _warm_text_processor,
+    "scoring_service": _warm_scoring_service,
+    "vector_service": _warm_vector_service,
+    "similarity_service": _warm_similarity_service,
+}
+
+# Progress of the warm-up, reported by /health
+warm_up_state: Dict[str, Any] = {"status": "pending", "steps": {}}
+
+async def _run_step(name: str, run: Callable[[], Awaitable[Any]]):
+    started = time.perf_counter()
+    warm_up_state["steps"][name] = {"status": "running"}
+    try:
+        await run()
+        warm_up_state["steps"][name] = {"status": "ready", "seconds": round(time.perf_counter() - started, 3)}
+    except Exception as e:
+        logger.error(f"Warm-up step {name} failed: {e}")
+        warm_up_state["steps"][name] = {"status": "failed", "error": str(e)}
+
+async def warm_up():
+    """Load models, open connections and start scoring workers concurrently"""
+    from app.services.scoring_executor import scoring_executor
+
+    warm_up_state["status"] = "warming"
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(_run_step(name, partial(asyncio.to_thread, step)) for name, step in WARM_UP_STEPS.items()),
+        _run_step("scoring_executor", scoring_executor.start)
+    )
+    failed = [name for name, step in warm_up_state["steps"].items() if step["status"] == "failed"]
+    warm_up_state["status"] = "degraded" if failed else "ready"
+    warm_up_state["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Warm-up finished in {warm_up_state['seconds']}s ({warm_up_state['status']})")
+
+async def monitor_vector_store():
+    """Poll Milvus for load and index progress in the background, so /health only reads cached state.
+
+    A collection found released is reloaded on the next search; one whose index
+    was rebuilt is reloaded here.
+    """
+    from app.core.config import settings
+
+    while True:
+        await asyncio.sleep(settings.HEALTH_CHECK_INTERVAL)
+        try:
+            await asyncio.to_thread(get_vector_service().status, True)
+        except Exception as e:
+            logger.warning(f"Vector store status refresh failed: {e}")
@@ -0,0 +1,117 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Per-process ScoringService, created once when a pool worker starts
+_worker_scoring_service = None
+
+def _init_worker():
+    """Load the spaCy pipeline once in each worker process"""
+    global _worker_scoring_service
+    from app.services.scoring_service import scoring_service
+    _worker_scoring_service = scoring_service
+
+def _call_in_worker(method: str, *args, **kwargs) -> Any:
+    """Run a ScoringService method inside a worker process"""
+    return getattr(_worker_scoring_service, method)(*args, **kwargs)
+
+def _ping() -> bool:
+    return _worker_scoring_service is not None
+
+class ScoringQueueFull(Exception):
+    """Raised when too many scoring requests are already waiting for a worker"""
+    pass
+
+class ScoringExecutor:
+    """Runs CPU-bound ScoringService work off the event loop.
+
+    Work is dispatched to a pool of processes that each keep a warm spaCy
+    pipeline. At most ``max_pending`` calls may be queued or running; callers
+    beyond that wait up to ``queue_timeout`` seconds and then get
+    ``ScoringQueueFull`` so the API can shed load instead of piling up.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        queue_timeout: Optional[float] = None
+    ):
+        self.max_workers = settings.SCORING_WORKERS if max_workers is None else max_workers
+        self.max_pending = max_pending or settings.SCORING_MAX_PENDING
+        self.queue_timeout = settings.SCORING_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Created on the server's event loop, not at import time
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        """Semaphore bounding pending calls, bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        return self._slots
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        """Create the process pool on first use; None means score in a thread instead"""
+        if self._pool is None and self.max_workers > 0:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return self._pool
+
+    async def start(self):
+        """Start the workers and wait until each has loaded its models"""
+        self._get_slots()
+        pool = self._get_pool()
+        if pool is None:
+            return
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(self.max_workers)))
+        logger.info(f"Scoring executor ready with {self.max_workers} worker processes")
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def submit(self, method: str, *args, **kwargs) -> Any:
+        """Run a ScoringService method in the pool, applying backpressure when it is saturated"""
+        slots = self._get_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ScoringQueueFull(f"Scoring queue is full ({self.max_pending} requests pending)")
+
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool()
+            if pool is None:
+                from app.services.scoring_service import scoring_service
+                call = functools.partial(getattr(scoring_service, method), *args, **kwargs)
+                return await loop.run_in_executor(None, call)
+            call = functools.partial(_call_in_worker, method, *args, **kwargs)
+            return await loop.run_in_executor(pool, call)
+        finally:
+            slots.release()
+
+    async def rank_documents(self, documents: List[Dict], query: Optional[str] = None) -> List[Dict]:
+        """Rank documents in a worker process"""
+        return await self.submit("rank_documents", documents, query)
+
+    async def calculate_relevance_score(self, content: str, query: Optional[str] = None) -> float:
+        """Calculate a relevance score in a worker process"""
+        return await self.submit("calculate_relevance_score", content, query)
+
+# Create singleton instance
+scoring_executor = ScoringExecutor()
@@ -4,23 +4,42 @@ from datetime import datetime
 from textblob import TextBlob
 import re
 from collections import Counter
-import spacy
+from functools import lru_cache
 from nltk.tokenize import sent_tokenize
 from nltk.corpus import stopwords
 import nltk
+from app.core.config import settings
+from app.utils.feature_cache import FeatureCache
+from app.utils.nlp_registry import get_nlp
+
+# Sentences containing any of these are counted as factual statements
+FACTUAL_INDICATORS = [
+    'is', 'are', 'was', 'were', 'has', 'have', 'had',
+    'contains', 'includes', 'consists', 'comprises',
+    'defined as', 'refers to', 'means', 'indicates'
+]
+
+# Parts of speech treated as key terms for relevance scoring
+KEY_TERM_POS = ('NOUN', 'PROPN')
+
+# Pipeline components each feature extraction can skip
+TERM_FEATURES_DISABLE = ['parser', 'ner', 'lemmatizer']
+SENTENCE_FEATURES_DISABLE = ['tagger', 'attribute_ruler', 'lemmatizer', 'ner']
+
+@lru_cache(maxsize=None)
+def ensure_nltk_data():
+    """Download required NLTK data once per process"""
+    try:
+        nltk.data.find('tokenizers/punkt')
+        nltk.data.find('corpora/stopwords')
+    except LookupError:
+        nltk.download('punkt')
+        nltk.download('stopwords')
 
 class ScoringService:
     def __init__(self):
-        # Download required NLTK data
-        try:
-            nltk.data.find('tokenizers/punkt')
-            nltk.data.find('corpora/stopwords')
-        except LookupError:
-            nltk.download('punkt')
-            nltk.download('stopwords')
-        
-        # Load spaCy model for NLP features
-        self.nlp = spacy.load('en_core_web_sm')
+        # spaCy, NLTK data and the feature cache are loaded on first use
+        self._feature_cache: Optional[FeatureCache] = None
         
         # Updated weights for knowledge base
         self.weights = {
@@ -31,13 +50,13 @@ class ScoringService:
             'engagement': 0.05            # User engagement (reduced weight)
         }
 
-    def calculate_knowledge_quality_score(self, content: str) -> float:
+    def calculate_knowledge_quality_score(self, content: str, sentence_features: Optional[Dict] = None) -> float:
         """Calculate knowledge quality score based on various factors"""
         # Structure score (presence of headings, lists, etc.)
         structure_score = self._calculate_structure_score(content)
         
         # Fact density score (ratio of factual statements)
-        fact_density_score = self._calculate_fact_density(content)
+        fact_density_score = self._calculate_fact_density(content, sentence_features)
         
         # Clarity score (sentence complexity and readability)
         clarity_score = self._calculate_clarity_score(content)
@@ -66,30 +85,119 @@ class ScoringService:
         structure_elements = sum([has_headings, has_lists, has_sections])
         return structure_elements / 3.0
 
-    def _calculate_fact_density(self, content: str) -> float:
+    def _calculate_fact_density(self, content: str, features: Optional[Dict] = None) -> float:
         """Calculate the density of factual statements"""
-        doc = self.nlp(content)
-        sentences = list(doc.sents)
+        if features is None:
+            features = self._get_sentence_features([content])[0]
         
-        if not sentences:
+        if not features['sentence_count']:
             return 0.0
-            
-        # Count sentences with factual indicators
-        factual_indicators = [
-            'is', 'are', 'was', 'were', 'has', 'have', 'had',
-            'contains', 'includes', 'consists', 'comprises',
-            'defined as', 'refers to', 'means', 'indicates'
-        ]
         
+        return features['factual_sentence_count'] / features['sentence_count']
+
+    @property
+    def nlp(self):
+        # Shared per-process spaCy pipeline for NLP features
+        return get_nlp()
+
+    @property
+    def feature_cache(self) -> FeatureCache:
+        # Derived spaCy features keyed by content hash, so unchanged documents are parsed once
+        if self._feature_cache is None:
+            self._feature_cache = FeatureCache(
+                max_entries=settings.SCORING_FEATURE_CACHE_SIZE,
+                cache_dir=settings.SCORING_FEATURE_CACHE_DIR,
+                namespace=f"{self.nlp.meta.get('name', 'nlp')}-{self.nlp.meta.get('version', '')}-"
+            )
+        return self._feature_cache
+
+    def warm_up(self):
+        """Load NLTK data and the spaCy pipeline ahead of the first request"""
+        ensure_nltk_data()
+        self.feature_cache
+
+    def _get_features(
+        self,
+        kind: str,
+        texts: List[str],
+        extract,
+        disable: List[str],
+        lowercase: bool = False,
+        batch_size: Optional[int] = None,
+        n_process: Optional[int] = None
+    ) -> List[Dict]:
+        """Get cached features for each text, parsing all cache misses in one nlp.pipe pass"""
+        results: List[Optional[Dict]] = [None] * len(texts)
+        pending: Dict[str, List[int]] = {}
+        
+        for i, text in enumerate(texts):
+            features = self.feature_cache.get(self.feature_cache.make_key(kind, text))
+            if features is not None:
+                results[i] = features
+            else:
+                pending.setdefault(text, []).append(i)
+        
+        if pending:
+            unique_texts = list(pending)
+            docs = self.nlp.pipe(
+                (text.lower() if lowercase else text for text in unique_texts),
+                batch_size=batch_size or settings.SCORING_BATCH_SIZE,
+                n_process=n_process or settings.SCORING_N_PROCESS,
+                disable=[name for name in disable if name in self.nlp.pipe_names]
+            )
+            for text, doc in zip(unique_texts, docs):
+                features = extract(doc)
+                self.feature_cache.set(self.feature_cache.make_key(kind, text), features)
+                for i in pending[text]:
+                    results[i] = features
+        
+        return results
+
+    def _get_sentence_features(self, texts: List[str], **pipe_options) -> List[Dict]:
+        """Get sentence counts for each text; only the parser is needed"""
+        return self._get_features(
+            'sentences', texts, self._extract_sentence_features, SENTENCE_FEATURES_DISABLE, **pipe_options
+        )
+
+    def _extract_sentence_features(self, doc) -> Dict:
+        """Count sentences and factual sentences in a parsed Doc"""
+        sentences = list(doc.sents)
         factual_sentences = sum(
             1 for sent in sentences
-            if any(indicator in sent.text.lower() for indicator in factual_indicators)
+            if any(indicator in sent.text.lower() for indicator in FACTUAL_INDICATORS)
         )
-        
-        return factual_sentences / len(sentences)
+        return {
+            'sentence_count': len(sentences),
+            'factual_sentence_count': factual_sentences
+        }
+
+    def _get_term_features(self, texts: List[str], **pipe_options) -> List[Dict]:
+        """Get key terms and doc vectors for each lowercased text; only POS tags are needed"""
+        return self._get_features(
+            'terms', texts, self._extract_term_features, TERM_FEATURES_DISABLE, lowercase=True, **pipe_options
+        )
+
+    def _extract_term_features(self, doc) -> Dict:
+        """Extract the key terms and vector used for relevance scoring from a parsed Doc"""
+        return {
+            'terms': frozenset(token.text for token in doc if token.pos_ in KEY_TERM_POS),
+            'vector': np.array(doc.vector, dtype=np.float32),
+            'vector_norm': float(doc.vector_norm),
+            # spaCy treats two identical single-token docs as a perfect match
+            'single_orth': doc[0].orth if len(doc) == 1 else None
+        }
+
+    def _vector_similarity(self, first: Dict, second: Dict) -> float:
+        """Cosine similarity between cached doc vectors, matching spaCy's Doc.similarity"""
+        if first['single_orth'] is not None and first['single_orth'] == second['single_orth']:
+            return 1.0
+        if first['vector_norm'] == 0 or second['vector_norm'] == 0:
+            return 0.0
+        return float(np.dot(first['vector'], second['vector']) / (first['vector_norm'] * second['vector_norm']))
 
     def _calculate_clarity_score(self, content: str) -> float:
         """Calculate clarity score based on sentence complexity"""
+        ensure_nltk_data()
         sentences = sent_tokenize(content)
         if not sentences:
             return 0.0
@@ -130,18 +238,38 @@ class ScoringService:
         completeness_elements = sum([has_definition, has_examples, has_context])
         return completeness_elements / 3.0
 
+    def calculate_content_scores(self, content: str) -> Dict[str, float]:
+        """Calculate the query-independent scores that are stored with a document"""
+        return {
+            'knowledge_quality_score': self.calculate_knowledge_quality_score(content),
+            'completeness_score': self.calculate_completeness_score(content)
+        }
+
+    def calculate_content_scores_batch(self, contents: List[str]) -> List[Dict[str, float]]:
+        """Calculate stored content scores for many texts, parsing them in one nlp.pipe pass"""
+        sentence_features = self._get_sentence_features(contents)
+        return [
+            {
+                'knowledge_quality_score': self.calculate_knowledge_quality_score(content, features),
+                'completeness_score': self.calculate_completeness_score(content)
+            }
+            for content, features in zip(contents, sentence_features)
+        ]
+
     def calculate_relevance_score(self, content: str, query: Optional[str] = None) -> float:
         """Calculate relevance score based on content and query"""
         if not query:
             return 0.5
             
-        # Process content and query
-        content_doc = self.nlp(content.lower())
-        query_doc = self.nlp(query.lower())
-        
+        # Process content and query (cached per text)
+        content_features, query_features = self._get_term_features([content, query])
+        return self._relevance_from_features(content_features, query_features)
+
+    def _relevance_from_features(self, content_features: Dict, query_features: Dict) -> float:
+        """Combine term overlap and vector similarity into a relevance score"""
         # Extract key terms (nouns and important words)
-        content_terms = set(token.text for token in content_doc if token.pos_ in ['NOUN', 'PROPN'])
-        query_terms = set(token.text for token in query_doc if token.pos_ in ['NOUN', 'PROPN'])
+        content_terms = content_features['terms']
+        query_terms = query_features['terms']
         
         if not query_terms:
             return 0.5
@@ -151,8 +279,8 @@ class ScoringService:
         total = len(content_terms.union(query_terms))
         term_score = overlap / total if total > 0 else 0
         
-        # Calculate semantic similarity using spaCy
-        similarity_score = content_doc.similarity(query_doc)
+        # Calculate semantic similarity from the spaCy doc vectors
+        similarity_score = self._vector_similarity(content_features, query_features)
         
         return 0.6 * term_score + 0.4 * similarity_score
 
@@ -197,13 +325,19 @@ class ScoringService:
         likes: int = 0,
         comments: int = 0,
         created_at: Optional[datetime] = None,
-        updated_at: Optional[datetime] = None
+        updated_at: Optional[datetime] = None,
+        knowledge_quality: Optional[float] = None,
+        completeness: Optional[float] = None,
+        relevance: Optional[float] = None
     ) -> Dict[str, float]:
         """Calculate overall document score combining all factors"""
-        # Calculate individual scores
-        knowledge_quality = self.calculate_knowledge_quality_score(content)
-        completeness = self.calculate_completeness_score(content)
-        relevance = self.calculate_relevance_score(content, query)
+        # Calculate individual scores, reusing stored content scores when available
+        if knowledge_quality is None:
+            knowledge_quality = self.calculate_knowledge_quality_score(content)
+        if completeness is None:
+            completeness = self.calculate_completeness_score(content)
+        if relevance is None:
+            relevance = self.calculate_relevance_score(content, query)
         engagement = self.calculate_engagement_score(views, likes, comments)
         
         # Handle freshness score
@@ -233,20 +367,49 @@ class ScoringService:
     def rank_documents(
         self,
         documents: List[Dict],
-        query: Optional[str] = None
+        query: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        n_process: Optional[int] = None
     ) -> List[Dict]:
-        """Rank a list of documents based on their scores"""
+        """Rank a list of documents based on their scores, parsing all texts in batches"""
+        pipe_options = {'batch_size': batch_size, 'n_process': n_process}
+        contents = [doc['content'] for doc in documents]
+        
+        # Relevance features for every document plus the query in one pass
+        relevance_scores = [None] * len(documents)
+        if query:
+            term_features = self._get_term_features(contents + [query], **pipe_options)
+            query_features = term_features[-1]
+            relevance_scores = [
+                self._relevance_from_features(features, query_features)
+                for features in term_features[:-1]
+            ]
+        
+        # Sentence features only for documents without a stored quality score
+        unscored = [i for i, doc in enumerate(documents) if doc.get('knowledge_quality_score') is None]
+        sentence_features = dict(zip(
+            unscored,
+            self._get_sentence_features([contents[i] for i in unscored], **pipe_options)
+        ))
+        
         scored_documents = []
         
-        for doc in documents:
+        for i, doc in enumerate(documents):
+            knowledge_quality = doc.get('knowledge_quality_score')
+            if knowledge_quality is None:
+                knowledge_quality = self.calculate_knowledge_quality_score(contents[i], sentence_features[i])
+            
             scores = self.calculate_overall_score(
-                content=doc['content'],
+                content=contents[i],
                 query=query,
                 views=doc.get('views', 0),
                 likes=doc.get('likes', 0),
                 comments=doc.get('comments', 0),
                 created_at=doc.get('created_at'),
-                updated_at=doc.get('updated_at')
+                updated_at=doc.get('updated_at'),
+                knowledge_quality=knowledge_quality,
+                completeness=doc.get('completeness_score'),
+                relevance=relevance_scores[i]
             )
             
             scored_doc = {**doc, 'scores': scores}
@@ -259,4 +422,7 @@ class ScoringService:
             reverse=True
         )
         
-        return ranked_documents 
\ No newline at end of file
+        return ranked_documents
+
+# Create singleton instance
+scoring_service = ScoringService()
\ No newline at end of file
@@ -0,0 +1,72 @@
+from typing import Any, Dict, Optional
+from dataclasses import asdict
+from sqlalchemy import Sequence, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import engine
+from app.models.document import Document, result_cache_generation
+from app.utils.result_cache import ResultCache
+from app.utils.search_filters import DocumentFilters
+
+# Key in Session.info set when the current transaction touched documents
+DOCUMENTS_CHANGED = "documents_changed"
+
+def normalize_query(query: str) -> str:
+    """Collapse case and whitespace so trivially different queries share an entry"""
+    return " ".join(query.casefold().split())
+
+def filters_key(filters: Optional[DocumentFilters]) -> Optional[Dict[str, Any]]:
+    """Order-independent representation of filters for cache keys"""
+    if filters is None:
+        return None
+    params = asdict(filters)
+    for name in ("tags", "knowledge_base_ids"):
+        if params[name] is not None:
+            params[name] = sorted(params[name])
+    return params
+
+class SequenceGeneration:
+    """Cache generation kept in a Postgres sequence, so a write in one worker invalidates all of them"""
+
+    def __init__(self, engine: Engine, sequence: Sequence):
+        self.engine = engine
+        self.sequence = sequence
+
+    def get(self) -> int:
+        with self.engine.connect() as conn:
+            # last_value reads the shared counter without consuming a value
+            return conn.execute(text(
+                f"SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {self.sequence.name}"
+            )).scalar_one()
+
+    def incr(self):
+        with self.engine.connect() as conn:
+            # nextval is not transactional, so nothing needs committing
+            conn.scalar(self.sequence.next_value())
+
+# Create singleton instance
+search_cache = ResultCache(
+    max_entries=settings.RESULT_CACHE_SIZE,
+    ttl=settings.RESULT_CACHE_TTL,
+    redis_url=settings.RESULT_CACHE_REDIS_URL,
+    # Redis holds the generation when configured; otherwise Postgres does, unless there is no Postgres
+    shared_generation=(
+        SequenceGeneration(engine, result_cache_generation) if engine.dialect.name == "postgresql" else None
+    )
+)
+
+# Writes that bypass DocumentService still invalidate cached results once committed
+@event.listens_for(Session, "after_flush")
+def _note_document_changes(session: Session, flush_context):
+    if any(isinstance(obj, Document) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[DOCUMENTS_CHANGED] = True
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session: Session):
+    if session.info.pop(DOCUMENTS_CHANGED, False):
+        search_cache.bump()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session):
+    session.info.pop(DOCUMENTS_CHANGED, None)
@@ -0,0 +1,216 @@
+from typing import Collection, List, Tuple, Optional, Iterable
+import threading
+import logging
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.document import Document
+from app.utils.search_filters import scope_key
+from app.utils.text_processing import text_processor
+
+logger = logging.getLogger(__name__)
+
+class SimilarityIndex:
+    """In-process index of normalized document vectors for fast top-k candidate lookup.
+
+    Vectors live in one contiguous float32 matrix with parallel arrays of document ids
+    and scope keys (see ``scope_key``), so a query is a single matrix-vector product
+    over the rows a scope mask selects, followed by ``argpartition``.
+    Each worker process holds its own copy, updated only by writes in that process.
+    """
+
+    def __init__(self, dimension: int = 384, initial_capacity: int = 1024):
+        self.dimension = dimension
+        self._lock = threading.RLock()
+        self._matrix = np.zeros((initial_capacity, dimension), dtype=np.float32)
+        self._ids = np.zeros(initial_capacity, dtype=np.int64)
+        self._scopes = np.zeros(initial_capacity, dtype=np.int64)
+        self._positions = {}  # document_id -> row in the matrix
+        self._size = 0
+        self._built = False
+        self._vectorizer_version = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def is_built(self) -> bool:
+        return self._built
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts and L2-normalize the rows so dot products are cosine similarities"""
+        vectors = text_processor.get_embeddings(texts, dimension=self.dimension)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+    def _reserve(self, capacity: int):
+        """Grow the backing arrays geometrically so appends stay amortized O(1)"""
+        if capacity <= len(self._ids):
+            return
+        new_capacity = max(capacity, len(self._ids) * 2)
+        matrix = np.zeros((new_capacity, self.dimension), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        scopes = np.zeros(new_capacity, dtype=np.int64)
+        scopes[:self._size] = self._scopes[:self._size]
+        self._matrix = matrix
+        self._ids = ids
+        self._scopes = scopes
+
+    def _put(self, document_id: int, vector: np.ndarray, scope: int):
+        row = self._positions.get(document_id)
+        if row is None:
+            self._reserve(self._size + 1)
+            row = self._size
+            self._size += 1
+            self._positions[document_id] = row
+            self._ids[row] = document_id
+        self._matrix[row] = vector
+        self._scopes[row] = scope
+
+    def build(self, db: Session, batch_size: Optional[int] = None):
+        """(Re)build the index by streaming every document from the database"""
+        batch_size = batch_size or settings.SIMILARITY_INDEX_BATCH_SIZE
+        with self._lock:
+            self._vectorizer_version = text_processor.vectorizer_version
+            self._positions = {}
+            self._size = 0
+            batch: List[Tuple[int, str, int]] = []
+            rows = db.query(Document.id, Document.content, Document.knowledge_base_id, Document.user_id).yield_per(batch_size)
+            for row in rows:
+                batch.append((row.id, row.content or "", scope_key(row.knowledge_base_id, row.user_id)))
+                if len(batch) >= batch_size:
+                    self._add_batch(batch)
+                    batch = []
+            if batch:
+                self._add_batch(batch)
+            self._built = True
+            logger.info(f"Built similarity index with {self._size} documents")
+
+    def _is_current(self) -> bool:
+        """Whether the index was built with the vectorizer version now in use"""
+        return self._built and self._vectorizer_version == text_processor.vectorizer_version
+
+    def ensure_built(self, db: Session):
+        """Build the index on first use, and rebuild it after a vectorizer hot-swap"""
+        text_processor.refresh_vectorizer()
+        if not self._is_current():
+            with self._lock:
+                if not self._is_current():
+                    self.build(db)
+
+    def _add_batch(self, batch: Iterable[Tuple[int, str, int]]):
+        batch = list(batch)
+        vectors = self._embed([content for _, content, _ in batch])
+        for (document_id, _, scope), vector in zip(batch, vectors):
+            self._put(document_id, vector, scope)
+
+    def upsert(self, document_id: int, content: str, scope: int):
+        """Add or replace a single document's vector"""
+        if not self._built:
+            # The document is picked up when the index is first built
+            return
+        vector = self._embed([content])[0]
+        with self._lock:
+            self._put(document_id, vector, scope)
+
+    def upsert_many(self, documents: Iterable[Tuple[int, str, int]]):
+        """Add or replace several (document_id, content, scope) with a single embedding pass"""
+        if not self._built:
+            return
+        with self._lock:
+            self._add_batch(documents)
+
+    def set_scope(self, document_id: int, scope: int):
+        """Move an indexed document to another knowledge base or owner without re-embedding it"""
+        with self._lock:
+            row = self._positions.get(document_id)
+            if row is not None:
+                self._scopes[row] = scope
+
+    def remove(self, document_id: int):
+        """Remove a document, moving the last row into its slot to keep the matrix contiguous"""
+        with self._lock:
+            row = self._positions.pop(document_id, None)
+            if row is None:
+                return
+            last = self._size - 1
+            if row != last:
+                moved_id = int(self._ids[last])
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved_id
+                self._scopes[row] = self._scopes[last]
+                self._positions[moved_id] = row
+            self._size = last
+
+    def get_vectors(self, document_ids: Iterable[int]) -> Tuple[List[int], np.ndarray]:
+        """Return the indexed ids among document_ids and a copy of their normalized vectors"""
+        with self._lock:
+            found = [document_id for document_id in dict.fromkeys(document_ids) if document_id in self._positions]
+            rows = np.fromiter((self._positions[document_id] for document_id in found), dtype=np.int64, count=len(found))
+            return found, self._matrix[rows]
+
+    def pairwise(self, doc1_id: int, doc2_id: int) -> Optional[float]:
+        """Cosine similarity of two indexed documents, or None if either is missing"""
+        with self._lock:
+            row1 = self._positions.get(doc1_id)
+            row2 = self._positions.get(doc2_id)
+            if row1 is None or row2 is None:
+                return None
+            return float(self._matrix[row1] @ self._matrix[row2])
+
+    def similarity_matrix(self, document_ids: Iterable[int]) -> Tuple[List[int], np.ndarray]:
+        """Cosine similarities between all pairs of indexed documents as one matrix product"""
+        found, vectors = self.get_vectors(document_ids)
+        return found, vectors @ vectors.T
+
+    def search(
+        self,
+        content: str,
+        top_k: int,
+        scopes: Optional[Collection[int]] = None,
+        allowed_ids: Optional[Collection[int]] = None
+    ) -> List[Tuple[int, float]]:
+        """Return up to ``top_k`` (document_id, cosine similarity) pairs, best first.
+
+        Only rows whose scope key is in ``scopes`` (a mask over the parallel array)
+        and, when given, in ``allowed_ids`` are scored, so filtering happens before the
+        top-k selection instead of after it.
+        """
+        query = self._embed([content])[0]
+        if not query.any():
+            return []
+        with self._lock:
+            size = self._size
+            if scopes is None and allowed_ids is None:
+                if size == 0:
+                    return []
+                scores = self._matrix[:size] @ query
+                ids = self._ids[:size].copy()
+            else:
+                mask = np.ones(size, dtype=bool)
+                if scopes is not None:
+                    mask &= np.isin(self._scopes[:size], np.fromiter(scopes, dtype=np.int64))
+                if allowed_ids is not None:
+                    allowed = np.zeros(size, dtype=bool)
+                    allowed[np.fromiter(
+                        (self._positions[i] for i in allowed_ids if i in self._positions), dtype=np.int64
+                    )] = True
+                    mask &= allowed
+                rows = np.flatnonzero(mask)
+                if len(rows) == 0:
+                    return []
+                scores = self._matrix[rows] @ query
+                ids = self._ids[rows]
+        k = min(top_k, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+# Create singleton instance
+similarity_index = SimilarityIndex()
@@ -1,37 +1,141 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
 from app.models.document import Document
-from app.services.scoring_service import ScoringService
+from app.services.scoring_service import scoring_service
+from app.services.similarity_index import similarity_index
+from app.services.scoring_executor import scoring_executor
+from app.utils.search_filters import DocumentFilters
+
+# Columns needed to score a candidate document
+CANDIDATE_COLUMNS = (
+    Document.id,
+    Document.title,
+    Document.content,
+    Document.created_at,
+    Document.updated_at,
+    Document.views,
+    Document.likes,
+    Document.comments,
+    Document.knowledge_quality_score,
+    Document.completeness_score
+)
 
 class SimpleSimilarityService:
     """A simplified document similarity service that uses the scoring service instead of a vector database."""
     
     def __init__(self):
-        self.scoring_service = ScoringService()
+        self.scoring_service = scoring_service
     
-    def find_similar_documents(self, db: Session, content: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def find_similar_documents(
+        self,
+        db: Session,
+        content: str,
+        top_k: int = 5,
+        filters: Optional[DocumentFilters] = None
+    ) -> List[Dict[str, Any]]:
         """Find similar documents based on content using the scoring service."""
-        # Fetch all documents from the database
-        documents = db.query(Document).all()
-        
-        # Convert documents to dictionary format
-        document_dicts = []
-        for doc in documents:
-            document_dicts.append({
-                'document_id': doc.id,
-                'title': doc.title,
-                'content': doc.content,
-                'created_at': doc.created_at,
-                'updated_at': doc.updated_at,
-                'views': doc.views or 0,
-                'likes': doc.likes or 0,
-                'comments': doc.comments or 0
-            })
+        document_dicts = self._candidate_documents(db, content, top_k, filters)
+        if not document_dicts:
+            return []
         
         # Use the scoring service to rank documents by relevance to the query content
         ranked_docs = self.scoring_service.rank_documents(document_dicts, content)
-        
+        return self._format_results(ranked_docs, top_k)
+
+    async def find_similar_documents_async(
+        self,
+        db: AsyncSession,
+        content: str,
+        top_k: int = 5,
+        filters: Optional[DocumentFilters] = None
+    ) -> List[Dict[str, Any]]:
+        """Find similar documents without blocking the event loop, ranking in the scoring executor."""
+        document_dicts = await self._candidate_documents_async(db, content, top_k, filters)
+        if not document_dicts:
+            return []
+        ranked_docs = await scoring_executor.rank_documents(document_dicts, content)
+        return self._format_results(ranked_docs, top_k)
+
+    def _candidate_ids(
+        self,
+        db: Session,
+        content: str,
+        top_k: int,
+        filters: Optional[DocumentFilters] = None
+    ) -> List[int]:
+        """Narrow the corpus to the nearest candidates from the in-memory index.
+
+        The index is per process and only sees writes made through this process
+        after it was built, so another worker's recent writes can be missing or
+        stale here until this worker rebuilds (on the next vectorizer swap or restart).
+        """
+        similarity_index.ensure_built(db)
+        pool_size = max(top_k, settings.SIMILARITY_CANDIDATE_POOL)
+        scopes, allowed_ids = None, None
+        if filters is not None:
+            # The tenant scope is a mask over the index; only attribute filters need Postgres
+            scopes = filters.scope_keys()
+            if filters.has_attribute_filters:
+                allowed_ids = {row.id for row in filters.apply(db.query(Document.id))}
+        return [document_id for document_id, _ in similarity_index.search(content, pool_size, scopes, allowed_ids)]
+
+    def _candidate_ids_in_thread(self, content: str, top_k: int, filters: Optional[DocumentFilters] = None) -> List[int]:
+        """Index lookup for async callers, with its own session in case the index must be built."""
+        return self._in_thread(self._candidate_ids, content, top_k, filters)
+
+    def _candidate_documents(
+        self,
+        db: Session,
+        content: str,
+        top_k: int,
+        filters: Optional[DocumentFilters] = None
+    ) -> List[Dict[str, Any]]:
+        """Fetch the documents worth scoring for a query as plain dictionaries."""
+        candidate_ids = self._candidate_ids(db, content, top_k, filters)
+        if not candidate_ids:
+            # The query shares no terms with the vocabulary (or nothing matches the filters);
+            # ranking the whole table would make a nonsense query cost O(corpus)
+            return []
+        query = db.query(*CANDIDATE_COLUMNS).filter(Document.id.in_(candidate_ids))
+        return [self._document_dict(row) for row in query.all()]
+
+    async def _candidate_documents_async(
+        self,
+        db: AsyncSession,
+        content: str,
+        top_k: int,
+        filters: Optional[DocumentFilters] = None
+    ) -> List[Dict[str, Any]]:
+        """Async variant of _candidate_documents; the CPU-bound index search runs in a thread."""
+        candidate_ids = await asyncio.to_thread(self._candidate_ids_in_thread, content, top_k, filters)
+        if not candidate_ids:
+            return []
+        result = await db.execute(select(*CANDIDATE_COLUMNS).where(Document.id.in_(candidate_ids)))
+        return [self._document_dict(row) for row in result.all()]
+
+    def _document_dict(self, row) -> Dict[str, Any]:
+        """Convert a candidate row to the dictionary format used for ranking."""
+        return {
+            'document_id': row.id,
+            'title': row.title,
+            'content': row.content,
+            'created_at': row.created_at,
+            'updated_at': row.updated_at,
+            'views': row.views or 0,
+            'likes': row.likes or 0,
+            'comments': row.comments or 0,
+            'knowledge_quality_score': row.knowledge_quality_score,
+            'completeness_score': row.completeness_score
+        }
+
+    def _format_results(self, ranked_docs: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """Transform ranked documents into the similarity response format."""
         # Transform the results to match the expected format
         result_docs = []
         for doc in ranked_docs[:top_k]:
@@ -53,9 +157,14 @@ class SimpleSimilarityService:
     def get_document(self, db: Session, document_id: int) -> Optional[Dict[str, Any]]:
         """Get a document by ID."""
         doc = db.query(Document).filter(Document.id == document_id).first()
-        if not doc:
-            return None
-        
+        return self._response_dict(doc) if doc else None
+
+    async def get_document_async(self, db: AsyncSession, document_id: int) -> Optional[Dict[str, Any]]:
+        """Get a document by ID using an async session."""
+        doc = await db.get(Document, document_id)
+        return self._response_dict(doc) if doc else None
+
+    def _response_dict(self, doc: Document) -> Dict[str, Any]:
         return {
             'document_id': doc.id,
             'title': doc.title,
@@ -67,16 +176,35 @@ class SimpleSimilarityService:
         }
     
     def get_document_similarity_score(self, db: Session, doc1_id: int, doc2_id: int) -> float:
-        """Calculate similarity score between two documents."""
-        doc1 = self.get_document(db, doc1_id)
-        doc2 = self.get_document(db, doc2_id)
-        
-        if not doc1 or not doc2:
-            return 0.0
-        
-        # Use the scoring service's relevance score as a similarity measure
-        similarity = self.scoring_service.calculate_relevance_score(doc1['content'], doc2['content'])
-        return similarity
+        """Cosine similarity of two documents from their stored normalized vectors."""
+        similarity_index.ensure_built(db)
+        similarity = similarity_index.pairwise(doc1_id, doc2_id)
+        return 0.0 if similarity is None else similarity
+
+    async def get_document_similarity_score_async(self, db: AsyncSession, doc1_id: int, doc2_id: int) -> float:
+        """Async variant of get_document_similarity_score; a first-time index build runs in a thread."""
+        return await asyncio.to_thread(self._in_thread, self.get_document_similarity_score, doc1_id, doc2_id)
+
+    def similarity_matrix(self, db: Session, document_ids: List[int]) -> Tuple[List[int], List[List[float]]]:
+        """Pairwise cosine similarities of many documents in one matrix product.
+
+        Returns the ids found in the index, in request order, and the matrix over them.
+        """
+        similarity_index.ensure_built(db)
+        found, matrix = similarity_index.similarity_matrix(document_ids)
+        return found, matrix.tolist()
+
+    async def similarity_matrix_async(self, document_ids: List[int]) -> Tuple[List[int], List[List[float]]]:
+        """Async variant of similarity_matrix, run in a thread with its own session."""
+        return await asyncio.to_thread(self._in_thread, self.similarity_matrix, document_ids)
+
+    def _in_thread(self, method, *args):
+        """Call a sync method with a session of its own, for use from asyncio.to_thread."""
+        db = SessionLocal()
+        try:
+            return method(db, *args)
+        finally:
+            db.close()
 
 # Create singleton instance
 simple_similarity_service = SimpleSimilarityService()
\ No newline at end of file
@@ -0,0 +1,96 @@
+from typing import Dict, Iterable, List, Mapping, Optional
+from datetime import datetime
+import threading
+from sqlalchemy import event, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.document import DocumentTag, Tag
+
+# Key in Session.info holding tag ids resolved in the current transaction
+PENDING_TAG_IDS = "pending_tag_ids"
+
+class TagService:
+    """Resolves tag names to ids in bulk and maintains the document_tags rows.
+
+    Resolved ids are cached per process. Ids resolved inside a transaction are
+    only promoted to the cache once that transaction commits, so a rollback
+    never leaves the cache pointing at a tag row that does not exist.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.TAG_CACHE_SIZE
+        self._cache: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def resolve_tag_ids(self, db: Session, names: Iterable[str]) -> Dict[str, int]:
+        """Map tag names to ids, creating missing tags with a single INSERT"""
+        names = list(dict.fromkeys(name for name in names if name))
+        with self._lock:
+            ids = {name: self._cache[name] for name in names if name in self._cache}
+        
+        missing = [name for name in names if name not in ids]
+        if missing:
+            ids.update(db.query(Tag.name, Tag.id).filter(Tag.name.in_(missing)).all())
+            missing = [name for name in missing if name not in ids]
+        
+        if missing:
+            now = datetime.utcnow()
+            statement = pg_insert(Tag).values(
+                [{"name": name, "created_at": now} for name in missing]
+            ).on_conflict_do_nothing(index_elements=[Tag.name]).returning(Tag.name, Tag.id)
+            ids.update(db.execute(statement).all())
+            # Tags inserted concurrently by another transaction are not returned
+            raced = [name for name in missing if name not in ids]
+            if raced:
+                ids.update(db.query(Tag.name, Tag.id).filter(Tag.name.in_(raced)).all())
+        
+        db.info.setdefault(PENDING_TAG_IDS, {}).update(ids)
+        return ids
+
+    def set_document_tags(self, db: Session, document_tags: Mapping[int, List[str]], replace: bool = False):
+        """Write document_tags rows for {document_id: tag names} without committing"""
+        if not document_tags:
+            return
+        if replace:
+            db.query(DocumentTag).filter(
+                DocumentTag.document_id.in_(list(document_tags))
+            ).delete(synchronize_session=False)
+        
+        ids = self.resolve_tag_ids(db, (name for names in document_tags.values() for name in names))
+        rows = [
+            {"document_id": document_id, "tag_id": ids[name]}
+            for document_id, names in document_tags.items()
+            for name in dict.fromkeys(names)
+            if name in ids
+        ]
+        if rows:
+            db.execute(insert(DocumentTag), rows)
+
+    def remove_document_tags(self, db: Session, document_id: int):
+        """Delete a document's document_tags rows without committing"""
+        db.query(DocumentTag).filter(DocumentTag.document_id == document_id).delete(synchronize_session=False)
+
+    def _promote(self, ids: Mapping[str, int]):
+        with self._lock:
+            self._cache.update(ids)
+            # Tags are small and rarely change, so a full reset is enough to bound memory
+            if len(self._cache) > self.max_entries:
+                self._cache = dict(ids)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+# Create singleton instance
+tag_service = TagService()
+
+@event.listens_for(Session, "after_commit")
+def _promote_committed_tag_ids(session: Session):
+    ids = session.info.pop(PENDING_TAG_IDS, None)
+    if ids:
+        tag_service._promote(ids)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_uncommitted_tag_ids(session: Session):
+    session.info.pop(PENDING_TAG_IDS, None)
@@ -1,4 +1,7 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from collections import defaultdict
+import logging
+import threading
 import numpy as np
 from pymilvus import (
     connections,
@@ -6,17 +9,73 @@ from pymilvus import (
     CollectionSchema,
     FieldSchema,
     DataType,
+    MilvusException,
     utility
 )
 from ..core.config import settings
+from .collection_state import CollectionState
 from ..utils.text_processing import text_processor
+from ..utils.search_filters import DocumentFilters, NO_KNOWLEDGE_BASE_ID
+
+logger = logging.getLogger(__name__)
+
+# Milvus caps the number of hits a single search may return
+MAX_SEARCH_LIMIT = 16384
+
+# Scalar fields that search filters are evaluated against inside Milvus
+FILTER_FIELDS = ("knowledge_base_id", "status", "category", "attributes")
+
+# Partition for documents outside any knowledge base
+DEFAULT_PARTITION = "_default"
+
+# Vector index built on new collections
+DEFAULT_INDEX_PARAMS = {
+    "metric_type": "L2",
+    "index_type": "IVF_FLAT",
+    "params": {"nlist": 1024}
+}
 
 class VectorService:
-    def __init__(self):
-        self.collection_name = settings.MILVUS_COLLECTION_NAME
+    def __init__(self, collection_name: Optional[str] = None):
+        # An explicit name pins the collection; otherwise follow the active vectorizer's collection
+        self._pinned_collection = collection_name is not None
+        self.collection_name = collection_name
         self.dimension = 384  # Keep same dimension for compatibility
-        self._connect()
-        self._ensure_collection()
+        # Milvus is contacted on first use, not at import time
+        self._collection: Optional[Collection] = None
+        self._has_filter_fields = False
+        # Partitions known to exist
+        self._partitions = set()
+        self.state: Optional[CollectionState] = None
+        self._init_lock = threading.Lock()
+
+    @property
+    def collection(self) -> Collection:
+        """Connect and open the collection on first use"""
+        if self._collection is None:
+            with self._init_lock:
+                if self._collection is None:
+                    if self.collection_name is None:
+                        self.collection_name = self._active_collection_name()
+                    self._connect()
+                    self._ensure_collection()
+        return self._collection
+
+    def _active_collection_name(self) -> str:
+        """Collection embedded with the active vectorizer version"""
+        return text_processor.vectorizer_metadata.get("collection") or settings.MILVUS_COLLECTION_NAME
+
+    def _sync_collection(self):
+        """Switch to the collection of a newly activated vectorizer version"""
+        if self._pinned_collection or self._collection is None:
+            # Not connected yet; the active collection is picked on first use
+            return
+        text_processor.refresh_vectorizer()
+        name = self._active_collection_name()
+        if name != self.collection_name:
+            logger.info(f"Switching Milvus collection from {self.collection_name} to {name}")
+            self.collection_name = name
+            self._ensure_collection()
 
     def _connect(self):
         """Connect to Milvus server"""
@@ -32,46 +91,173 @@ class VectorService:
             fields = [
                 FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
                 FieldSchema(name="document_id", dtype=DataType.INT64),
+                FieldSchema(name="chunk_index", dtype=DataType.INT64),
+                FieldSchema(name="chunk_offset", dtype=DataType.INT64),
                 FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
+                # Filter fields, copied from the document onto each of its chunks
+                FieldSchema(name="knowledge_base_id", dtype=DataType.INT64),
+                FieldSchema(name="status", dtype=DataType.VARCHAR, max_length=50),
+                FieldSchema(name="category", dtype=DataType.VARCHAR, max_length=100),
+                # Tags as {"tags": [...]}, matched with json_contains_any/json_contains_all
+                FieldSchema(name="attributes", dtype=DataType.JSON),
                 FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.dimension)
             ]
-            schema = CollectionSchema(fields=fields, description="Document collection")
-            self.collection = Collection(name=self.collection_name, schema=schema)
+            schema = CollectionSchema(fields=fields, description="Document chunk collection")
+            self._collection = Collection(name=self.collection_name, schema=schema)
             
             # Create index for vector field
-            index_params = {
-                "metric_type": "L2",
-                "index_type": "IVF_FLAT",
-                "params": {"nlist": 1024}
-            }
-            self.collection.create_index(field_name="embedding", index_params=index_params)
+            self._collection.create_index(field_name="embedding", index_params=DEFAULT_INDEX_PARAMS)
         else:
-            self.collection = Collection(self.collection_name)
+            self._collection = Collection(self.collection_name)
+            field_names = {field.name for field in self._collection.schema.fields}
+            if "chunk_index" not in field_names:
+                logger.error(
+                    f"Milvus collection '{self.collection_name}' predates chunk-level indexing; "
+                    "drop it or set MILVUS_COLLECTION_NAME to a new collection and re-index documents"
+                )
+        field_names = {field.name for field in self._collection.schema.fields}
+        self._has_filter_fields = all(name in field_names for name in FILTER_FIELDS)
+        if not self._has_filter_fields:
+            logger.warning(
+                f"Milvus collection '{self.collection_name}' has no filter fields; filtered searches "
+                "are narrowed after the vector search until documents are re-embedded with fit_vectorizer"
+            )
+        self._partitions = {partition.name for partition in self._collection.partitions}
+        self.state = CollectionState(self._collection)
+
+    def warm_up(self):
+        """Connect, load the collection once and record its load and index progress"""
+        self.collection
+        self.state.ensure_loaded()
+        self.state.refresh()
 
-    def create_embedding(self, text: str) -> List[float]:
+    def status(self, refresh: bool = False) -> Dict[str, Any]:
+        """Load state of the collection for health checks; never connects on its own.
+
+        ``refresh`` polls Milvus and may reload the collection, so only the
+        background monitor passes it.
+        """
+        if self.state is None:
+            return {"collection": self.collection_name, "ready": False, "error": "not connected"}
+        if refresh:
+            self.state.refresh()
+        return self.state.status()
+
+    def rebuild_index(self, index_params: Optional[Dict[str, Any]] = None):
+        """Rebuild the vector index and load the collection again once it is built"""
+        self._sync_collection()
+        self.state.invalidate()
+        self.collection.release()
+        self.collection.drop_index()
+        self.collection.create_index(field_name="embedding", index_params=index_params or DEFAULT_INDEX_PARAMS)
+        utility.wait_for_index_building_complete(self.collection_name)
+        self.state.ensure_loaded()
+
+    def partition_name(self, knowledge_base_id: Optional[int]) -> str:
+        """Partition holding a knowledge base's documents"""
+        return f"kb_{knowledge_base_id}" if knowledge_base_id else DEFAULT_PARTITION
+
+    def _ensure_partition(self, name: str):
+        """Create a partition on first insert into it"""
+        if name in self._partitions:
+            return
+        if not self.collection.has_partition(name):
+            self.collection.create_partition(name)
+            self.state.partition_created(name)
+        self._partitions.add(name)
+
+    def _existing_partitions(self, names: List[str]) -> List[str]:
+        """Drop partitions that were never created, i.e. knowledge bases without documents"""
+        if any(name not in self._partitions for name in names):
+            # Another worker may have created them since we last looked
+            self._partitions = {partition.name for partition in self.collection.partitions}
+        return [name for name in names if name in self._partitions]
+
+    def load_partitions(self, names: List[str]):
+        """Load partitions into query nodes, skipping those already loaded"""
+        self.collection
+        self.state.ensure_loaded(self._existing_partitions(names))
+
+    def release_partitions(self, names: List[str]):
+        """Release partitions from query nodes without touching other tenants' partitions"""
+        self.collection
+        self.state.release_partitions(self._existing_partitions(names))
+
+    def create_embedding(self, text: str) -> np.ndarray:
         """Create embedding for a text using TF-IDF vectorizer from text_processor"""
-        embedding = text_processor.get_embeddings([text])[0]
-        
-        # Ensure embedding has correct dimension
-        if len(embedding) < self.dimension:
-            # Pad with zeros if needed
-            embedding = embedding + [0.0] * (self.dimension - len(embedding))
-        elif len(embedding) > self.dimension:
-            # Truncate if needed
-            embedding = embedding[:self.dimension]
-            
-        return embedding
+        return self.create_embeddings([text])[0]
+
+    def create_embeddings(self, texts: List[str], strict: bool = False) -> np.ndarray:
+        """Create float32 embeddings of the collection's dimension with a single vectorizer transform"""
+        return text_processor.get_embeddings(texts, dimension=self.dimension, strict=strict)
+
+    def _chunk_documents(self, contents: List[str]) -> List[List[Tuple[int, str]]]:
+        """Split documents into sentence-aware (offset, text) chunks for indexing, in batched spaCy passes"""
+        chunked = text_processor.chunk_texts_with_offsets(contents, max_chunk_size=settings.VECTOR_CHUNK_SIZE)
+        return [chunks or [(0, content)] for content, chunks in zip(contents, chunked)]
 
-    def add_document(self, document_id: int, content: str, metadata: Dict[str, Any] = None) -> int:
-        """Add a document to the collection"""
-        embedding = self.create_embedding(content)
+    def add_document(self, document_id: int, content: str, metadata: Dict[str, Any] = None) -> Optional[int]:
+        """Add a document to the collection as one vector per chunk, returning the first chunk's key"""
+        return self.add_documents([(document_id, content)], [metadata])[0]
+
+    def add_documents(
+        self,
+        documents: List[Tuple[int, str]],
+        metadata: Optional[List[Optional[Dict[str, Any]]]] = None
+    ) -> List[Optional[int]]:
+        """Add a batch of (document_id, content) pairs with one embedding pass and one insert.
+
+        ``metadata`` is a parallel list of dicts with the document's knowledge_base_id,
+        status, category and tags, stored on every chunk for filtered search.
+        """
+        if not documents:
+            return []
+        
+        self._sync_collection()
+        if text_processor.vectorizer is None:
+            # Zero vectors would be stored as if they were embeddings; fit_vectorizer embeds every document
+            logger.error(
+                f"No fitted TF-IDF vectorizer; {len(documents)} documents are not indexed in Milvus "
+                "until `python -m app.commands.fit_vectorizer` runs"
+            )
+            return [None] * len(documents)
+        metadata = metadata or [None] * len(documents)
+        columns = {name: [] for name in ("document_id", "chunk_index", "chunk_offset", "content") + FILTER_FIELDS}
+        first_rows = []
+        rows_by_partition = defaultdict(list)
+        chunked = self._chunk_documents([content for _, content in documents])
+        for (document_id, _), meta, chunks in zip(documents, metadata, chunked):
+            meta = meta or {}
+            first_rows.append(len(columns["content"]))
+            partition = self.partition_name(meta.get("knowledge_base_id"))
+            for chunk_index, (offset, chunk) in enumerate(chunks):
+                rows_by_partition[partition].append(len(columns["content"]))
+                columns["document_id"].append(document_id)
+                columns["chunk_index"].append(chunk_index)
+                columns["chunk_offset"].append(offset)
+                columns["content"].append(chunk)
+                columns["knowledge_base_id"].append(meta.get("knowledge_base_id") or NO_KNOWLEDGE_BASE_ID)
+                columns["status"].append(meta.get("status") or "draft")
+                columns["category"].append(meta.get("category") or "")
+                columns["attributes"].append({"tags": list(meta.get("tags") or []), "user_id": meta.get("user_id")})
+        
+        # Rows of the float32 matrix go to pymilvus as-is, without building Python float lists
+        columns["embedding"] = list(self.create_embeddings(columns["content"], strict=True))
+        # Order the columns by the collection schema, which also drops the filter
+        # fields for collections created before they existed
         data = [
-            [document_id],
-            [content],
-            [embedding]
+            columns[field.name]
+            for field in self.collection.schema.fields
+            if not field.auto_id
         ]
-        mr = self.collection.insert(data)
-        return mr.primary_keys[0]
+        # One insert per knowledge base partition touched by the batch
+        primary_keys = [None] * len(columns["content"])
+        for partition, rows in rows_by_partition.items():
+            self._ensure_partition(partition)
+            mr = self.collection.insert([[column[row] for row in rows] for column in data], partition_name=partition)
+            for row, key in zip(rows, mr.primary_keys):
+                primary_keys[row] = key
+        return [primary_keys[row] for row in first_rows]
 
     def update_document(self, document_id: int, content: str, metadata: Dict[str, Any] = None) -> int:
         """Update a document in the collection"""
@@ -81,97 +267,197 @@ class VectorService:
         # Add the updated document
         return self.add_document(document_id, content, metadata)
 
-    def search_similar(self, query: str, top_k: int = 5) -> List[dict]:
-        """Search for similar documents"""
+    def search_similar(
+        self,
+        query: str,
+        top_k: int = 5,
+        include_content: bool = True,
+        filters: Optional[DocumentFilters] = None,
+        partition_names: Optional[List[str]] = None
+    ) -> List[dict]:
+        """Search for similar documents.
+
+        With include_content=False only ids, chunk positions and distances come back;
+        reranking uses the stored chunk vectors and callers hydrate display fields.
+        ``filters`` become a boolean expression that Milvus applies before the ANN
+        search, so top_k is filled from matching documents only. The search covers
+        ``partition_names``, or the partitions of the filters' knowledge base scope
+        (plus the default partition for the owner's documents outside any), or the
+        whole collection when neither is given.
+        """
         try:
-            print(f"Searching for similar documents with query length: {len(query)}")
+            logger.debug(f"Searching for similar documents with query length: {len(query)}")
             
-            self.collection.load()
-            print("Collection loaded successfully")
+            self._sync_collection()
+            if partition_names is None and filters is not None:
+                knowledge_base_ids = filters.scoped_knowledge_base_ids()
+                if knowledge_base_ids is not None:
+                    partition_names = [self.partition_name(kb_id) for kb_id in knowledge_base_ids]
+                    if filters.scoped_owner_id() is not None:
+                        partition_names.append(DEFAULT_PARTITION)
+            if partition_names is not None:
+                partition_names = self._existing_partitions(partition_names)
+                if not partition_names:
+                    return []
+            # A no-op once loaded, so the hot path is just the search RPC
+            self.collection
+            self.state.ensure_loaded(partition_names)
             
             query_embedding = self.create_embedding(query)
-            print(f"Created embedding with dimension: {len(query_embedding)}")
+            logger.debug(f"Created embedding with dimension: {len(query_embedding)}")
             
             search_params = {
                 "metric_type": "L2",
                 "params": {"nprobe": 20}  # Increased from 10 to 20 for better recall
             }
             
-            results = self.collection.search(
+            # Several chunks of one document can match, so fetch enough chunk hits
+            # to still cover top_k + 5 distinct documents after pooling
+            chunk_limit = min((top_k + 5) * settings.VECTOR_CHUNK_FANOUT, MAX_SEARCH_LIMIT)
+            # Stored chunk vectors come back with the hits so reranking never re-embeds text
+            output_fields = ["document_id", "chunk_index", "chunk_offset", "embedding"]
+            if include_content:
+                output_fields.append("content")
+            expr = None
+            if filters is not None and self._has_filter_fields:
+                expr = filters.to_milvus_expr()
+            search_kwargs = dict(
                 data=[query_embedding],
                 anns_field="embedding",
                 param=search_params,
-                limit=top_k + 5,  # Fetch more results than needed to ensure we don't miss similar docs
-                output_fields=["document_id", "content"]
+                limit=chunk_limit,
+                expr=expr,
+                partition_names=partition_names,
+                output_fields=output_fields
             )
-            print(f"Search completed. Results: {len(results[0]) if results else 0}")
-            
-            similar_docs = []
-            for hits in results:
-                for hit in hits:
-                    # Add more fields to the response for better debugging
-                    similar_docs.append({
-                        "document_id": hit.entity.get("document_id"),
-                        "title": self._extract_title(hit.entity.get("content", "")),
-                        "content": hit.entity.get("content"),
-                        "distance": hit.distance
-                    })
+            try:
+                results = self.collection.search(**search_kwargs)
+            except MilvusException:
+                # Released or restarted since we loaded it; load again and retry once
+                self.state.invalidate()
+                self.state.ensure_loaded(partition_names)
+                results = self.collection.search(**search_kwargs)
+            logger.debug(f"Search completed. Chunk hits: {len(results[0]) if results else 0}")
             
-            print(f"Processed {len(similar_docs)} similar documents")
+            similar_docs = self._pool_chunk_hits(results, output_fields)[:top_k + 5]
             
-            # Sort by distance (lower is more similar)
-            similar_docs.sort(key=lambda x: x["distance"])
+            logger.debug(f"Processed {len(similar_docs)} similar documents")
             
             # Use text_processor to rerank results if needed
             if similar_docs and len(similar_docs) > 1:
-                reranked_docs = text_processor.rerank_results(query, similar_docs, top_k=top_k + 5)
-                print(f"Reranked {len(reranked_docs)} documents")
+                embeddings = [doc.pop("embedding", None) for doc in similar_docs]
+                if all(embedding is not None for embedding in embeddings):
+                    reranked_docs = text_processor.rerank_results(
+                        query, similar_docs, top_k=top_k + 5,
+                        embeddings=embeddings, query_embedding=query_embedding
+                    )
+                elif include_content:
+                    reranked_docs = text_processor.rerank_results(
+                        query, similar_docs, top_k=top_k + 5, query_embedding=query_embedding
+                    )
+                else:
+                    # Vectors were not returned and there is no text to embed; keep the pooled order
+                    reranked_docs = similar_docs
+                logger.debug(f"Reranked {len(reranked_docs)} documents")
                 # Return only the top_k results
                 return reranked_docs[:top_k]
             
+            for doc in similar_docs:
+                doc.pop("embedding", None)
+            
             # Return only the top_k results
-            print(f"Returning {len(similar_docs[:top_k])} documents")
+            logger.debug(f"Returning {len(similar_docs[:top_k])} documents")
             return similar_docs[:top_k]
         except Exception as e:
-            print(f"Error in search_similar: {str(e)}")
+            logger.error(f"Error in search_similar: {str(e)}")
             # Return empty list instead of raising, to avoid breaking the UI
             return []
 
+    def _pool_chunk_hits(self, results, output_fields: List[str]) -> List[dict]:
+        """Aggregate chunk hits into one result per document using max or sum pooling"""
+        pooled: Dict[int, dict] = {}
+        for hits in results:
+            for hit in hits:
+                document_id = hit.entity.get("document_id")
+                score = 1.0 / (1.0 + hit.distance)
+                doc = pooled.get(document_id)
+                if doc is None:
+                    # Hits arrive nearest first, so the first chunk seen is the best match
+                    doc = {
+                        "document_id": document_id,
+                        "chunk_index": hit.entity.get("chunk_index"),
+                        "chunk_offset": hit.entity.get("chunk_offset"),
+                        "distance": hit.distance,
+                        "score": score
+                    }
+                    if "content" in output_fields:
+                        doc["title"] = self._extract_title(hit.entity.get("content", ""))
+                        doc["content"] = hit.entity.get("content")
+                    if "embedding" in output_fields:
+                        doc["embedding"] = hit.entity.get("embedding")
+                    pooled[document_id] = doc
+                elif settings.VECTOR_CHUNK_POOLING == "sum":
+                    doc["score"] += score
+        
+        # Sort by pooled score (higher is more similar)
+        return sorted(pooled.values(), key=lambda x: x["score"], reverse=True)
+
     def _extract_title(self, content: str) -> str:
         """Extract title from content for better display in results"""
         if not content:
             return "Untitled"
-            
+        
+        first_line = content.strip().split("\n", 1)[0].strip()
+        return first_line[:100] if first_line else "Untitled"
+
+    def delete_document(self, document_id: int) -> bool:
         """Delete a document from the collection"""
+        self._sync_collection()
         expr = f'document_id == {document_id}'
         self.collection.delete(expr)
         return True
 
     def get_document(self, document_id: int) -> Optional[dict]:
-        """Get a document by ID"""
+        """Get a document by ID, reassembling its content from the stored chunks"""
+        self._sync_collection()
         expr = f'document_id == {document_id}'
-        results = self.collection.query(expr, output_fields=["document_id", "content"])
-        return results[0] if results else None
-    
-    def get_document_similarity_score(self, doc1_id: int, doc2_id: int) -> float:
-        """Calculate similarity score between two documents using cosine similarity"""
-        # Get documents
-        doc1 = self.get_document(doc1_id)
-        doc2 = self.get_document(doc2_id)
-        
-        if not doc1 or not doc2:
-            return 0.0
-            
-        # Get embeddings
-        doc1_embedding = self.create_embedding(doc1["content"])
-        doc2_embedding = self.create_embedding(doc2["content"])
+        results = self.collection.query(expr, output_fields=["document_id", "chunk_index", "content"])
+        if not results:
+            return None
         
-        # Calculate cosine similarity
-        similarity = np.dot(doc1_embedding, doc2_embedding) / (
-            np.linalg.norm(doc1_embedding) * np.linalg.norm(doc2_embedding)
+        chunks = sorted(results, key=lambda chunk: chunk["chunk_index"])
+        return {
+            "document_id": document_id,
+            "content": " ".join(chunk["content"] for chunk in chunks)
+        }
+    
+    def get_document_vectors(self, document_ids: List[int]) -> Dict[int, np.ndarray]:
+        """Unit-length document vectors from the stored chunk embeddings, with one query.
+
+        Chunk vectors are mean-pooled per document, so nothing is re-embedded.
+        """
+        self._sync_collection()
+        results = self.collection.query(
+            f"document_id in {[int(document_id) for document_id in document_ids]}",
+            output_fields=["document_id", "embedding"]
         )
+        chunks: Dict[int, List] = defaultdict(list)
+        for chunk in results:
+            chunks[chunk["document_id"]].append(chunk["embedding"])
         
-        return float(similarity)
+        vectors = {}
+        for document_id, embeddings in chunks.items():
+            vector = np.asarray(embeddings, dtype=np.float32).mean(axis=0)
+            norm = np.linalg.norm(vector)
+            vectors[document_id] = vector / norm if norm > 0 else vector
+        return vectors
+
+    def get_document_similarity_score(self, doc1_id: int, doc2_id: int) -> float:
+        """Cosine similarity of two documents from their stored vectors"""
+        vectors = self.get_document_vectors([doc1_id, doc2_id])
+        if doc1_id not in vectors or doc2_id not in vectors:
+            return 0.0
+        return float(vectors[doc1_id] @ vectors[doc2_id])
 
 # Create a singleton instance
 vector_service = VectorService()
\ No newline at end of file
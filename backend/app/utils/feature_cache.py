@@ -0,0 +1,96 @@
+from typing import Any, Optional
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+class FeatureCache:
+    """Bounded LRU cache for derived NLP features with an optional on-disk tier.
+
+    Keys are content hashes, so an entry is valid for exactly one version of a
+    document's text and never needs explicit invalidation.
+    """
+
+    def __init__(self, max_entries: int = 10000, cache_dir: Optional[str] = None, namespace: str = ""):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.namespace = namespace
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"Disabling on-disk feature cache at {self.cache_dir}: {e}")
+                self.cache_dir = None
+
+    def make_key(self, kind: str, text: str) -> str:
+        """Build a cache key from the feature kind and a hash of the text"""
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return f"{self.namespace}{kind}-{digest}"
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[-2:], f"{key}.pkl")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a cached value, checking memory first and then disk"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+            except FileNotFoundError:
+                value = None
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable feature cache entry {path}: {e}")
+                value = None
+            if value is not None:
+                self._remember(key, value)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        """Store a value in memory and, if configured, on disk"""
+        self._remember(key, value)
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write to a temp file first so readers never see a partial entry
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.warning(f"Failed to write feature cache entry {path}: {e}")
+
+    def _remember(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all in-memory entries"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,77 @@
+from typing import List, Tuple
+import hashlib
+import re
+import zlib
+import numpy as np
+
+# Hashes are taken modulo this Mersenne prime and then truncated to 32 bits
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+class MinHasher:
+    """MinHash signatures over word shingles, with LSH banding.
+
+    A signature is ``num_perm`` uint32 minimums of universal hash functions
+    applied to the 32-bit hashes of a document's shingles; the fraction of
+    equal positions in two signatures estimates the Jaccard similarity of
+    their shingle sets. Splitting a signature into ``bands`` of ``rows`` gives
+    bucket keys that collide for pairs above roughly ``(1/bands)**(1/rows)``.
+    The permutations come from a fixed seed so signatures stay comparable
+    across processes and releases.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def shingle_hashes(self, text: str) -> np.ndarray:
+        """32-bit hashes of the distinct lowercase word shingles of a text"""
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        if len(tokens) <= self.shingle_size:
+            shingles = {" ".join(tokens)} if tokens else set()
+        else:
+            shingles = {
+                " ".join(tokens[i:i + self.shingle_size])
+                for i in range(len(tokens) - self.shingle_size + 1)
+            }
+        return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text as a uint32 array of length num_perm"""
+        hashes = self.shingle_hashes(text)
+        if len(hashes) == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        # (a * x + b) mod p for every shingle and permutation; uint64 wraparound is intended
+        permuted = (np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature: np.ndarray) -> List[Tuple[int, int]]:
+        """(band, bucket) pairs; bucket is a signed 64-bit digest of the band's rows"""
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(chunk, digest_size=8).digest()
+            keys.append((band, int.from_bytes(digest, "big", signed=True)))
+        return keys
+
+    @staticmethod
+    def to_bytes(signature: np.ndarray) -> bytes:
+        return signature.astype("<u4").tobytes()
+
+    @staticmethod
+    def from_bytes(payload: bytes) -> np.ndarray:
+        return np.frombuffer(payload, dtype="<u4")
+
+    @staticmethod
+    def jaccard(signature1: np.ndarray, signature2: np.ndarray) -> float:
+        """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+        return float(np.mean(signature1 == signature2))
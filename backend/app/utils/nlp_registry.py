@@ -0,0 +1,22 @@
+from functools import lru_cache
+import logging
+import spacy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "en_core_web_sm"
+
+@lru_cache(maxsize=None)
+def get_nlp(name: str = DEFAULT_MODEL):
+    """Load a spaCy pipeline once per process and share it between services.
+
+    Callers must treat the pipeline as read-only and use ``disable=`` on
+    ``nlp.pipe`` rather than removing components.
+    """
+    try:
+        logger.info(f"Loading spaCy model {name}")
+        return spacy.load(name)
+    except Exception as e:
+        logger.warning(f"Failed to load spaCy model {name}: {str(e)}")
+        # Fallback to a simpler NLP pipeline
+        return spacy.blank("en")
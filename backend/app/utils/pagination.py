@@ -0,0 +1,52 @@
+from typing import Any, List, Optional, Sequence, Tuple
+from datetime import datetime
+import base64
+import json
+from sqlalchemy import DateTime, tuple_
+
+# Response header carrying the cursor of the next page; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row of a page as an opaque cursor"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    """Decode a cursor produced by encode_cursor for the same sort columns.
+
+    Raises ValueError if the cursor is malformed or was issued for a different ordering.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("Invalid pagination cursor")
+    return [
+        datetime.fromisoformat(value) if isinstance(column.type, DateTime) and value is not None else value
+        for column, value in zip(columns, values)
+    ]
+
+def keyset(statement, columns: Sequence[Any], cursor: Optional[str], limit: int, descending: bool = False):
+    """Order a Query or Select by columns and start it after the cursor.
+
+    One extra row is fetched so ``page`` can tell whether another page exists.
+    The sort columns must end in a unique column (normally the primary key).
+    """
+    statement = statement.order_by(*[column.desc() if descending else column.asc() for column in columns])
+    if cursor:
+        key = tuple_(*columns)
+        position = tuple_(*decode_cursor(cursor, columns))
+        statement = statement.filter(key < position if descending else key > position)
+    return statement.limit(limit + 1)
+
+def page(rows: Sequence[Any], columns: Sequence[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Split the rows of a keyset query into the page and the cursor of the next page"""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column in columns])
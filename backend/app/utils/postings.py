@@ -0,0 +1,151 @@
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+from bisect import bisect_left
+
+# Postings per compressed block; a block is only decoded when a cursor lands in it
+BLOCK_SIZE = 128
+
+def encode_varbyte(values: Iterable[int]) -> bytes:
+    """Variable-byte encode non-negative ints, 7 bits per byte, low bits first"""
+    out = bytearray()
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+def decode_varbyte(payload: bytes) -> List[int]:
+    values = []
+    value = shift = 0
+    for byte in payload:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    return values
+
+class Block(NamedTuple):
+    first_doc: int
+    last_doc: int
+    payload: bytes  # varbyte (doc gap, tf) pairs; the first gap is relative to first_doc
+
+    def decode(self) -> Tuple[List[int], List[int]]:
+        values = decode_varbyte(self.payload)
+        docs, doc = [], self.first_doc
+        for gap in values[0::2]:
+            doc += gap
+            docs.append(doc)
+        return docs, values[1::2]
+
+class PostingList:
+    """Doc-ordered (doc, tf) postings of one term, sealed into varbyte blocks of BLOCK_SIZE.
+
+    Docs must be appended in increasing order. Blocks keep their first and
+    last doc so cursors can skip them without decoding. The largest tf and
+    smallest document length seen bound the BM25 score of any posting.
+    """
+    __slots__ = ("blocks", "tail_docs", "tail_tfs", "max_tf", "min_length", "length")
+
+    def __init__(self):
+        self.blocks: List[Block] = []
+        self.tail_docs: List[int] = []
+        self.tail_tfs: List[int] = []
+        self.max_tf = 0
+        self.min_length = None
+        self.length = 0
+
+    def append(self, doc: int, tf: int, length: int):
+        self.tail_docs.append(doc)
+        self.tail_tfs.append(tf)
+        self.max_tf = max(self.max_tf, tf)
+        self.min_length = length if self.min_length is None else min(self.min_length, length)
+        self.length += 1
+        if len(self.tail_docs) >= BLOCK_SIZE:
+            self._seal()
+
+    def _seal(self):
+        docs, tfs = self.tail_docs, self.tail_tfs
+        pairs, previous = [], docs[0]
+        for doc, tf in zip(docs, tfs):
+            pairs.append(doc - previous)
+            pairs.append(tf)
+            previous = doc
+        self.blocks.append(Block(docs[0], docs[-1], encode_varbyte(pairs)))
+        self.tail_docs, self.tail_tfs = [], []
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self):
+        for block in self.blocks:
+            yield from zip(*block.decode())
+        yield from zip(self.tail_docs, self.tail_tfs)
+
+    def remapped(self, new_doc: Callable[[int], Optional[int]], length_of: Callable[[int], int]) -> "PostingList":
+        """Copy with docs renumbered by new_doc, dropping those it maps to None"""
+        postings = PostingList()
+        for doc, tf in self:
+            doc = new_doc(doc)
+            if doc is not None:
+                postings.append(doc, tf, length_of(doc))
+        return postings
+
+    def cursor(self) -> "PostingCursor":
+        return PostingCursor(self)
+
+class PostingCursor:
+    """Forward iterator over a posting list that skips whole blocks when advancing"""
+    __slots__ = ("postings", "block_index", "docs", "tfs", "position", "doc")
+
+    def __init__(self, postings: PostingList):
+        self.postings = postings
+        self.block_index = -1
+        self.docs: List[int] = []
+        self.tfs: List[int] = []
+        self.position = 0
+        self.doc: Optional[int] = None
+        self._load(0)
+
+    def _load(self, block_index: int):
+        blocks = self.postings.blocks
+        self.block_index = block_index
+        self.position = 0
+        if block_index < len(blocks):
+            self.docs, self.tfs = blocks[block_index].decode()
+        elif block_index == len(blocks):
+            self.docs, self.tfs = self.postings.tail_docs, self.postings.tail_tfs
+        else:
+            self.docs, self.tfs = [], []
+        self.doc = self.docs[0] if self.docs else None
+
+    @property
+    def tf(self) -> int:
+        return self.tfs[self.position]
+
+    def next(self):
+        self.position += 1
+        if self.position < len(self.docs):
+            self.doc = self.docs[self.position]
+        else:
+            self._load(self.block_index + 1)
+
+    def advance(self, target: int):
+        """Move to the first posting with doc >= target (doc becomes None past the end)"""
+        if self.doc is None or self.doc >= target:
+            return
+        blocks = self.postings.blocks
+        if self.docs[-1] < target:
+            # Skip sealed blocks by their last doc without decoding them
+            block_index = self.block_index + 1
+            while block_index < len(blocks) and blocks[block_index].last_doc < target:
+                block_index += 1
+            self._load(block_index)
+            if self.doc is None or self.doc >= target:
+                return
+        self.position = bisect_left(self.docs, target, self.position)
+        if self.position < len(self.docs):
+            self.doc = self.docs[self.position]
+        else:
+            self._load(self.block_index + 1)
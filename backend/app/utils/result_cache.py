@@ -0,0 +1,197 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Protocol
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import logging
+import pickle
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class GenerationCounter(Protocol):
+    """Generation counter shared by every process using the cache"""
+
+    def get(self) -> int: ...
+
+    def incr(self): ...
+
+class ResultCache:
+    """LRU cache with TTL for computed query results, with an optional Redis tier.
+
+    Keys include a corpus generation counter. Writers call ``bump`` after a
+    change is committed, which makes every earlier entry unreachable, so a
+    hit is never older than the last write. The counter is read from Redis
+    when configured, else from ``shared_generation``; only without either is
+    it per process, which is safe with a single worker process only.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2000,
+        ttl: float = 300.0,
+        redis_url: Optional[str] = None,
+        namespace: str = "results:",
+        shared_generation: Optional[GenerationCounter] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.namespace = namespace
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._generation = 0
+        self._pending_shared_bumps = 0  # bumps of the shared generation still running in the executor
+        self._lock = threading.Lock()
+        self._redis = self._connect_redis(redis_url) if redis_url else None
+        self._shared_generation = shared_generation
+        self.hits = 0
+        self.misses = 0
+
+    def _connect_redis(self, redis_url: str):
+        try:
+            import redis
+        except ImportError:
+            logger.warning("RESULT_CACHE_REDIS_URL is set but the redis package is not installed; caching per process")
+            return None
+        return redis.Redis.from_url(redis_url, socket_timeout=0.05, socket_connect_timeout=0.05)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def generation(self) -> int:
+        if self._redis is not None:
+            try:
+                return int(self._redis.get(f"{self.namespace}generation") or 0) + self._pending_shared_bumps
+            except Exception as e:
+                logger.warning(f"Falling back to the local cache generation: {e}")
+        elif self._shared_generation is not None:
+            try:
+                return self._shared_generation.get() + self._pending_shared_bumps
+            except Exception as e:
+                logger.warning(f"Falling back to the local cache generation: {e}")
+        return self._generation
+
+    def bump(self):
+        """Invalidate every cached result after the corpus changed.
+
+        The shared generation is bumped with a blocking round trip, so on an
+        event loop (e.g. an AsyncSession commit) that part runs in the default
+        executor. Until it lands this process counts it as already applied, so
+        its own reads never see the previous generation.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        in_background = loop is not None and (self._redis is not None or self._shared_generation is not None)
+        with self._lock:
+            self._generation += 1
+            # Old entries can no longer be hit; drop them now instead of waiting for eviction
+            self._entries.clear()
+            if in_background:
+                self._pending_shared_bumps += 1
+        if in_background:
+            loop.run_in_executor(None, self._bump_shared_in_background)
+        else:
+            self._bump_shared()
+
+    def _bump_shared_in_background(self):
+        try:
+            self._bump_shared()
+        finally:
+            with self._lock:
+                self._pending_shared_bumps -= 1
+
+    def _bump_shared(self):
+        if self._redis is not None:
+            try:
+                self._redis.incr(f"{self.namespace}generation")
+            except Exception as e:
+                logger.warning(f"Failed to bump the shared cache generation: {e}")
+        elif self._shared_generation is not None:
+            try:
+                self._shared_generation.incr()
+            except Exception as e:
+                logger.warning(f"Failed to bump the shared cache generation: {e}")
+
+    def make_key(self, kind: str, params: Dict[str, Any]) -> str:
+        """Key for one result at the current generation"""
+        payload = json.dumps(params, sort_keys=True, default=str)
+        digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        return f"{self.namespace}{self.generation}:{kind}:{digest}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a live cached value, checking memory first and then Redis"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self._redis is not None:
+            try:
+                payload = self._redis.get(key)
+            except Exception as e:
+                logger.warning(f"Result cache read from Redis failed: {e}")
+                payload = None
+            if payload is not None:
+                value = pickle.loads(payload)
+                self._remember(key, value)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        """Store a value in memory and, if configured, in Redis with the same TTL"""
+        self._remember(key, value)
+        if self._redis is not None:
+            try:
+                self._redis.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=max(1, int(self.ttl)))
+            except Exception as e:
+                logger.warning(f"Result cache write to Redis failed: {e}")
+
+    def _remember(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def _call(self, function: Callable, *args) -> Any:
+        # Redis and shared generation calls block, so keep them off the event loop
+        if self._redis is None and self._shared_generation is None:
+            return function(*args)
+        return await asyncio.to_thread(function, *args)
+
+    async def get_or_compute(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Return the cached result for (kind, params) or compute and cache it"""
+        if not self.enabled:
+            return await compute()
+        key = await self._call(self.make_key, kind, params)
+        value = await self._call(self.get, key)
+        if value is not None:
+            return value
+        value = await compute()
+        # Computed against generation N and stored under N, so a write committed meanwhile
+        # (bumping to N+1) means the entry is simply never read
+        await self._call(self.set, key, value)
+        return value
+
+    def clear(self):
+        """Drop all in-memory entries"""
+        with self._lock:
+            self._entries.clear()
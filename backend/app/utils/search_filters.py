@@ -0,0 +1,139 @@
+from typing import Any, Dict, List, Optional
+from dataclasses import dataclass
+import json
+from sqlalchemy import and_, cast, or_
+from sqlalchemy.dialects.postgresql import JSONB, array
+from app.models.document import Document
+
+# Milvus stores documents without a knowledge base under this id, since scalar fields cannot be null
+NO_KNOWLEDGE_BASE_ID = 0
+
+def scope_key(knowledge_base_id: Optional[int], user_id: Optional[int]) -> int:
+    """A document's knowledge base id, or its owner's id negated when it has no knowledge base"""
+    if knowledge_base_id:
+        return knowledge_base_id
+    return -user_id if user_id else NO_KNOWLEDGE_BASE_ID
+
+@dataclass
+class DocumentFilters:
+    """Restrictions applied to search candidates before they are ranked.
+
+    ``tags`` match documents having any of the tags, or all of them when
+    ``tag_mode`` is "all". ``knowledge_base_ids`` is the tenant scope derived
+    from the requesting user, not a client parameter; None means unscoped.
+    Documents outside any knowledge base are in that scope only for their
+    owner, ``owner_id``.
+    """
+    tags: Optional[List[str]] = None
+    tag_mode: str = "any"
+    category: Optional[str] = None
+    status: Optional[str] = None
+    knowledge_base_id: Optional[int] = None
+    knowledge_base_ids: Optional[List[int]] = None
+    owner_id: Optional[int] = None
+
+    def __post_init__(self):
+        if self.tag_mode not in ("any", "all"):
+            raise ValueError("tag_mode must be 'any' or 'all'")
+        self.tags = [tag for tag in (self.tags or []) if tag] or None
+
+    @property
+    def has_attribute_filters(self) -> bool:
+        """Whether anything besides the knowledge base scope restricts the documents"""
+        return bool(self.tags or self.category or self.status)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (
+            self.tags or self.category or self.status
+            or self.knowledge_base_id is not None or self.knowledge_base_ids is not None
+        )
+
+    def scoped_knowledge_base_ids(self) -> Optional[List[int]]:
+        """Knowledge bases a search may touch, or None when it may touch all of them"""
+        if self.knowledge_base_id is None:
+            return self.knowledge_base_ids
+        if self.knowledge_base_ids is None or self.knowledge_base_id in self.knowledge_base_ids:
+            return [self.knowledge_base_id]
+        return []
+
+    def scoped_owner_id(self) -> Optional[int]:
+        """User whose documents outside any knowledge base a scoped search may also touch"""
+        if self.knowledge_base_ids is None or self.knowledge_base_id is not None:
+            return None
+        return self.owner_id
+
+    def scope_keys(self) -> Optional[List[int]]:
+        """Scope keys (see scope_key) of the documents a search may touch, or None for all of them"""
+        knowledge_base_ids = self.scoped_knowledge_base_ids()
+        owner_id = self.scoped_owner_id()
+        if knowledge_base_ids is None or owner_id is None:
+            return knowledge_base_ids
+        return knowledge_base_ids + [scope_key(None, owner_id)]
+
+    def allows(self, document: Any) -> bool:
+        """Whether a loaded document is inside the tenant scope"""
+        if self.knowledge_base_ids is None:
+            return True
+        if document.knowledge_base_id is None:
+            return self.owner_id is not None and document.user_id == self.owner_id
+        return document.knowledge_base_id in self.knowledge_base_ids
+
+    def to_milvus_expr(self) -> Optional[str]:
+        """Boolean expression over the collection's scalar fields, evaluated before the ANN search.
+
+        The knowledge base scope is left out; it selects partitions instead. The
+        default partition is shared, so there only the owner's documents match.
+        """
+        # json.dumps quotes and escapes strings the way Milvus expressions expect
+        clauses = []
+        if self.knowledge_base_id is not None:
+            clauses.append(f"knowledge_base_id == {int(self.knowledge_base_id)}")
+        owner_id = self.scoped_owner_id()
+        if owner_id is not None:
+            clauses.append(
+                f'(knowledge_base_id != {NO_KNOWLEDGE_BASE_ID} or attributes["user_id"] == {int(owner_id)})'
+            )
+        if self.status:
+            clauses.append(f"status == {json.dumps(self.status)}")
+        if self.category:
+            clauses.append(f"category == {json.dumps(self.category)}")
+        if self.tags:
+            function = "json_contains_all" if self.tag_mode == "all" else "json_contains_any"
+            clauses.append(f'{function}(attributes["tags"], {json.dumps(self.tags)})')
+        return " and ".join(clauses) or None
+
+    def apply(self, query):
+        """Filter a Query or Select over Document"""
+        if self.knowledge_base_id is not None:
+            query = query.filter(Document.knowledge_base_id == self.knowledge_base_id)
+        if self.knowledge_base_ids is not None:
+            in_scope = Document.knowledge_base_id.in_(self.knowledge_base_ids)
+            if self.owner_id is not None:
+                in_scope = or_(
+                    in_scope, and_(Document.knowledge_base_id.is_(None), Document.user_id == self.owner_id)
+                )
+            query = query.filter(in_scope)
+        return self.apply_attributes(query)
+
+    def apply_attributes(self, query):
+        """Filter on everything but the knowledge base scope; tag matching uses the GIN index on tags"""
+        if self.status:
+            query = query.filter(Document.status == self.status)
+        if self.category:
+            query = query.filter(Document.category == self.category)
+        if self.tags:
+            tags = cast(Document.tags, JSONB)
+            tag_array = array(self.tags)
+            query = query.filter(tags.has_all(tag_array) if self.tag_mode == "all" else tags.has_any(tag_array))
+        return query
+
+def vector_metadata(document: Any) -> Dict[str, Any]:
+    """Scalar fields stored with a document's vectors so searches can pre-filter on them"""
+    return {
+        "knowledge_base_id": document.knowledge_base_id or NO_KNOWLEDGE_BASE_ID,
+        "status": document.status or "draft",
+        "category": document.category or "",
+        "tags": list(document.tags or []),
+        "user_id": document.user_id
+    }
@@ -1,52 +1,148 @@
-from typing import List, Dict, Any
-import spacy
+from typing import List, Dict, Any, Tuple, Optional
 import numpy as np
 import os
+import time
+import threading
 import logging
 from sklearn.feature_extraction.text import TfidfVectorizer
-import pickle
+from scipy.sparse import csr_matrix
+from app.core.config import settings
+from app.utils.nlp_registry import get_nlp
+from app.utils.vectorizer_store import VectorizerStore
 
 logger = logging.getLogger(__name__)
 
+# Width of the dense embeddings handed to the vector store
+EMBEDDING_DIMENSION = 384
+
+# Components sentence boundaries come from; the parser listens to tok2vec, so it stays too
+SENTENCE_PIPES = ("tok2vec", "parser", "senter")
+
+def build_vectorizer() -> TfidfVectorizer:
+    """Create an unfitted TF-IDF vectorizer with the parameters used for embeddings"""
+    # TF-IDF vectorizer for embeddings instead of Hugging Face models
+    return TfidfVectorizer(
+        max_features=EMBEDDING_DIMENSION,  # Match previous embedding dimension
+        stop_words='english',
+        ngram_range=(1, 2)
+    )
+
 class TextProcessor:
     def __init__(self):
-        # Load spaCy model for text processing
+        # The vectorizer is fitted offline by `python -m app.commands.fit_vectorizer`;
+        # (version, vectorizer, pointer metadata) is swapped as one tuple so readers
+        # never see a vectorizer paired with another version's metadata.
+        # Nothing is loaded until first use so importing this module stays cheap.
+        self.store = VectorizerStore(settings.MODELS_DIR)
+        self._vectorizer_state: Optional[Tuple[Optional[str], Optional[Any], Dict[str, Any]]] = None
+        self._pinned = False
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._last_reload_check = 0.0
+
+    @property
+    def nlp(self):
+        # Shared per-process spaCy pipeline
+        return get_nlp()
+
+    def _state(self) -> Tuple[Optional[str], Optional[Any], Dict[str, Any]]:
+        """Return the vectorizer state, loading the active version on first use"""
+        if self._vectorizer_state is None:
+            with self._load_lock:
+                if self._vectorizer_state is None:
+                    self._vectorizer_state = self._read_active_vectorizer() or (None, None, {})
+                    self._last_reload_check = time.monotonic()
+        return self._vectorizer_state
+
+    @property
+    def vectorizer(self) -> Optional[Any]:
+        return self._state()[1]
+
+    @property
+    def vectorizer_version(self) -> Optional[str]:
+        return self._state()[0]
+
+    @property
+    def vectorizer_metadata(self) -> Dict[str, Any]:
+        return self._state()[2]
+
+    def warm_up(self):
+        """Load the spaCy pipeline and the active vectorizer ahead of the first request"""
+        self.nlp
+        self._state()
+
+    def _read_active_vectorizer(self) -> Optional[Tuple[str, Any, Dict[str, Any]]]:
+        """Read whichever vectorizer version is currently active"""
         try:
-            self.nlp = spacy.load("en_core_web_sm")
+            version, vectorizer, metadata = self.store.load_active()
         except Exception as e:
-            logger.warning(f"Failed to load spaCy model: {str(e)}")
-            # Fallback to a simpler NLP pipeline
-            self.nlp = spacy.blank("en")
-        
-        # Create TF-IDF vectorizer for embeddings instead of Hugging Face models
-        self.vectorizer = TfidfVectorizer(
-            max_features=384,  # Match previous embedding dimension
-            stop_words='english',
-            ngram_range=(1, 2)
-        )
-        
-        # Try to load pre-trained vectorizer if available
-        models_dir = os.environ.get("MODELS_DIR", "/app/models")
-        vectorizer_path = os.path.join(models_dir, "tfidf_vectorizer.pkl")
-        
-        if os.path.exists(vectorizer_path):
-            try:
-                logger.info(f"Loading TF-IDF vectorizer from {vectorizer_path}")
-                with open(vectorizer_path, 'rb') as f:
-                    self.vectorizer = pickle.load(f)
-            except Exception as e:
-                logger.warning(f"Failed to load vectorizer from {vectorizer_path}: {e}")
-                # Keep the default vectorizer initialized above
-        else:
-            logger.info("Using new TF-IDF vectorizer")
-            # The vectorizer will be fit on the first batch of documents
-            self._vectorizer_fitted = False
+            logger.warning(f"Failed to load TF-IDF vectorizer from {settings.MODELS_DIR}: {e}")
+            return None
+        if vectorizer is None:
+            logger.warning("No fitted TF-IDF vectorizer found; run `python -m app.commands.fit_vectorizer`")
+            return None
+        logger.info(f"Using TF-IDF vectorizer version {version}")
+        return version, vectorizer, metadata
+
+    def _load_active_vectorizer(self):
+        """Swap in whichever vectorizer version is currently active"""
+        state = self._read_active_vectorizer()
+        if state is not None and state[0] != self.vectorizer_version:
+            self._vectorizer_state = state
+
+    def refresh_vectorizer(self, force: bool = False):
+        """Hot-swap to a newly activated vectorizer, checking at most every VECTORIZER_RELOAD_INTERVAL seconds"""
+        if self._pinned:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_reload_check < settings.VECTORIZER_RELOAD_INTERVAL:
+            return
+        if not self._reload_lock.acquire(blocking=False):
+            # Another thread is already checking
+            return
+        try:
+            self._last_reload_check = now
+            pointer = self.store.read_pointer()
+            if pointer and pointer.get("version") != self.vectorizer_version:
+                self._load_active_vectorizer()
+        except Exception as e:
+            logger.warning(f"Failed to check for a new TF-IDF vectorizer: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def use_vectorizer(self, version: str, vectorizer: Any, **metadata):
+        """Pin this process to a specific vectorizer, e.g. while re-embedding with a new fit"""
+        self._vectorizer_state = (version, vectorizer, metadata)
+        self._pinned = True
     
     def chunk_text(self, text: str, max_chunk_size: int = 512) -> List[str]:
         """Split text into semantic chunks using spaCy."""
-        doc = self.nlp(text)
+        return [chunk for _, chunk in self.chunk_text_with_offsets(text, max_chunk_size)]
+
+    def chunk_text_with_offsets(self, text: str, max_chunk_size: int = 512) -> List[Tuple[int, str]]:
+        """Split text into sentence-aligned chunks, returning (character offset, chunk text) pairs."""
+        return self.chunk_texts_with_offsets([text], max_chunk_size)[0]
+
+    def chunk_texts_with_offsets(
+        self,
+        texts: List[str],
+        max_chunk_size: int = 512,
+        batch_size: Optional[int] = None
+    ) -> List[List[Tuple[int, str]]]:
+        """Chunk many texts in one nlp.pipe pass, running only the components that find sentences."""
+        nlp = self.nlp
+        docs = nlp.pipe(
+            texts,
+            batch_size=batch_size or settings.VECTOR_CHUNK_BATCH_SIZE,
+            disable=[name for name in nlp.pipe_names if name not in SENTENCE_PIPES]
+        )
+        return [self._chunk_sentences(doc, max_chunk_size) for doc in docs]
+
+    def _chunk_sentences(self, doc, max_chunk_size: int) -> List[Tuple[int, str]]:
+        """Group a parsed document's sentences into chunks of at most max_chunk_size words"""
         chunks = []
         current_chunk = []
+        current_start = 0
         current_size = 0
         
         for sent in doc.sents:
@@ -54,80 +150,95 @@ class TextProcessor:
             sent_size = len(sent_text.split())
             
             if current_size + sent_size > max_chunk_size and current_chunk:
-                chunks.append(" ".join(current_chunk))
+                chunks.append((current_start, " ".join(current_chunk)))
                 current_chunk = [sent_text]
+                current_start = sent.start_char
                 current_size = sent_size
             else:
+                if not current_chunk:
+                    current_start = sent.start_char
                 current_chunk.append(sent_text)
                 current_size += sent_size
         
         if current_chunk:
-            chunks.append(" ".join(current_chunk))
+            chunks.append((current_start, " ".join(current_chunk)))
             
         return chunks
 
-    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts using TF-IDF instead of transformer models."""
-        # Fit vectorizer if it's the first use
-        if not hasattr(self, '_vectorizer_fitted') or not self._vectorizer_fitted:
-            try:
-                self.vectorizer.fit(texts)
-                self._vectorizer_fitted = True
-                
-                # Try to save the fitted vectorizer
-                models_dir = os.environ.get("MODELS_DIR", "/app/models")
-                if not os.path.exists(models_dir):
-                    os.makedirs(models_dir, exist_ok=True)
-                    
-                vectorizer_path = os.path.join(models_dir, "tfidf_vectorizer.pkl")
-                with open(vectorizer_path, 'wb') as f:
-                    pickle.dump(self.vectorizer, f)
-                logger.info(f"Saved TF-IDF vectorizer to {vectorizer_path}")
-            except Exception as e:
-                logger.error(f"Error fitting vectorizer: {e}")
+    def get_sparse_embeddings(self, texts: List[str]) -> Optional[csr_matrix]:
+        """Generate TF-IDF embeddings as a float32 sparse matrix, or None if the vectorizer fails."""
+        self.refresh_vectorizer()
+        vectorizer = self.vectorizer
+        if vectorizer is None:
+            logger.error("No fitted TF-IDF vectorizer; run `python -m app.commands.fit_vectorizer`")
+            return None
         
         # Transform texts to TF-IDF vectors
         try:
-            tfidf_matrix = self.vectorizer.transform(texts)
-            # Convert sparse matrix to dense and then to list
-            return tfidf_matrix.toarray().tolist()
+            return csr_matrix(vectorizer.transform(texts), dtype=np.float32)
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
-            # Return zero vectors as fallback
-            return [[0.0] * 384 for _ in range(len(texts))]
+            return None
+
+    def get_embeddings(self, texts: List[str], dimension: int = EMBEDDING_DIMENSION, strict: bool = False) -> np.ndarray:
+        """Generate dense float32 embeddings of shape (len(texts), dimension) using TF-IDF.
+
+        Columns beyond ``dimension`` are dropped and missing ones are zero, so callers
+        never need to pad. Rows are views into one contiguous array. If the texts
+        cannot be vectorized the result is all zeros, or with ``strict`` an error.
+        """
+        embeddings = np.zeros((len(texts), dimension), dtype=np.float32)
+        tfidf_matrix = self.get_sparse_embeddings(texts)
+        if tfidf_matrix is None:
+            if strict:
+                raise RuntimeError("Texts could not be embedded; see the TF-IDF vectorizer errors above")
+            # Zero vectors match nothing, which is the right answer for a query
+            return embeddings
+        
+        # Scatter the non-zero entries straight into the dense float32 array
+        rows = np.repeat(np.arange(tfidf_matrix.shape[0]), np.diff(tfidf_matrix.indptr))
+        in_range = tfidf_matrix.indices < dimension
+        embeddings[rows[in_range], tfidf_matrix.indices[in_range]] = tfidf_matrix.data[in_range]
+        return embeddings
 
-    def rerank_results(self, query: str, documents: List[Dict[str, Any]], top_k: int = 5) -> List[Dict[str, Any]]:
-        """Rerank documents using simple BM25-style scoring instead of transformer models."""
+    def rerank_results(
+        self,
+        query: str,
+        documents: List[Dict[str, Any]],
+        top_k: int = 5,
+        embeddings: Optional[Any] = None,
+        query_embedding: Optional[Any] = None
+    ) -> List[Dict[str, Any]]:
+        """Rerank documents by TF-IDF cosine similarity to the query.
+
+        Pass the documents' stored vectors as ``embeddings`` (and the query vector as
+        ``query_embedding``) to skip re-embedding; all candidates are then scored
+        with a single matrix-vector product.
+        """
         if not documents:
             return []
         
-        # Extract content
-        contents = [doc['content'] for doc in documents]
-        
         # Get query embedding
-        query_embedding = self.get_embeddings([query])[0]
+        if query_embedding is None:
+            query_embedding = self.get_embeddings([query])[0]
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
         
         # Get document embeddings
-        doc_embeddings = self.get_embeddings(contents)
-        
-        # Calculate cosine similarity
-        scores = []
-        for doc_embedding in doc_embeddings:
-            # Simple dot product for similarity (since TF-IDF vectors are already normalized)
-            similarity = sum(q * d for q, d in zip(query_embedding, doc_embedding))
-            scores.append(similarity)
+        if embeddings is None:
+            embeddings = self.get_embeddings([doc['content'] for doc in documents])
+        doc_matrix = np.asarray(embeddings, dtype=np.float32)
         
-        # Combine scores with original documents
-        scored_docs = list(zip(documents, scores))
+        # Simple dot product for similarity (since TF-IDF vectors are already normalized)
+        width = min(doc_matrix.shape[1], query_vector.shape[0])
+        scores = doc_matrix[:, :width] @ query_vector[:width]
         
-        # Sort by score and take top k
-        scored_docs.sort(key=lambda x: x[1], reverse=True)
-        top_docs = scored_docs[:top_k]
+        # Sort by score and take top k (stable, so ties keep their incoming order)
+        top_indexes = np.argsort(-scores, kind='stable')[:top_k]
         
         # Return reranked documents with scores
         return [{
-            **doc,
-            'rerank_score': float(score)
-        } for doc, score in top_docs]
+            **documents[i],
+            'rerank_score': float(scores[i])
+        } for i in top_indexes]
 
 text_processor = TextProcessor()
\ No newline at end of file
@@ -0,0 +1,180 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+logger = logging.getLogger(__name__)
+
+# Pre-versioning artifact written by older releases
+LEGACY_VECTORIZER_FILE = "tfidf_vectorizer.pkl"
+
+# Files making up one vectorizer version
+IDF_FILE = "idf.npy"
+VOCAB_FILE = "vocab.json"
+PARAMS_FILE = "params.json"
+
+# Tokenization parameters copied from the fitted TfidfVectorizer
+TOKENIZER_PARAMS = ("lowercase", "stop_words", "ngram_range", "token_pattern")
+
+class MappedTfidfVectorizer:
+    """Read-only TF-IDF transform backed by a memory-mapped IDF array.
+
+    The IDF weights are opened with ``mmap_mode='r'`` so every worker process
+    shares the same pages, and only the term-to-column table is built per
+    process. ``transform`` matches ``TfidfVectorizer.transform`` for the
+    parameters used by ``build_vectorizer``.
+    """
+
+    def __init__(self, vocabulary: List[str], idf: np.ndarray, params: Dict[str, Any]):
+        self.idf = idf
+        self.sublinear_tf = params.get("sublinear_tf", False)
+        self.norm = params.get("norm", "l2")
+        tokenizer_params = {key: params[key] for key in TOKENIZER_PARAMS if key in params}
+        if "ngram_range" in tokenizer_params:
+            tokenizer_params["ngram_range"] = tuple(tokenizer_params["ngram_range"])
+        self._counter = CountVectorizer(vocabulary=vocabulary, dtype=np.float32, **tokenizer_params)
+
+    @classmethod
+    def load(cls, path: str) -> "MappedTfidfVectorizer":
+        with open(os.path.join(path, VOCAB_FILE), "r", encoding="utf-8") as f:
+            vocabulary = json.load(f)
+        with open(os.path.join(path, PARAMS_FILE), "r", encoding="utf-8") as f:
+            params = json.load(f)
+        idf = np.load(os.path.join(path, IDF_FILE), mmap_mode="r")
+        return cls(vocabulary, idf, params)
+
+    def transform(self, texts: List[str]) -> csr_matrix:
+        """Transform texts to a float32 TF-IDF matrix"""
+        counts = csr_matrix(self._counter.transform(texts), dtype=np.float32)
+        if self.sublinear_tf:
+            np.log(counts.data, out=counts.data)
+            counts.data += 1
+        counts.data *= self.idf[counts.indices]
+        if self.norm:
+            normalize(counts, norm=self.norm, copy=False)
+        return counts
+
+class VectorizerStore:
+    """Versioned TF-IDF vectorizer artifacts under ``<models_dir>/vectorizers``.
+
+    Each fit is saved as an immutable ``tfidf-<version>/`` directory holding the
+    IDF weights as ``.npy`` and the vocabulary as a JSON list. A small ``CURRENT``
+    JSON pointer names the active version plus any metadata (such as the Milvus
+    collection embedded with it) and is replaced atomically, so readers always
+    see either the old or the new version, never a mix.
+    """
+
+    def __init__(self, models_dir: str):
+        self.models_dir = models_dir
+        self.vectorizers_dir = os.path.join(models_dir, "vectorizers")
+        self.pointer_path = os.path.join(self.vectorizers_dir, "CURRENT")
+
+    def _artifact_path(self, version: str) -> str:
+        return os.path.join(self.vectorizers_dir, f"tfidf-{version}")
+
+    def _pickle_path(self, version: str) -> str:
+        # Versions saved before artifacts were memory-mappable
+        return os.path.join(self.vectorizers_dir, f"tfidf-{version}.pkl")
+
+    def _write_atomic(self, path: str, payload: bytes):
+        """Write to a temp file in the same directory and rename it into place"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def save(self, vectorizer: Any) -> str:
+        """Save a fitted TfidfVectorizer as a new version without activating it"""
+        if not vectorizer.use_idf:
+            raise ValueError("Only vectorizers fitted with use_idf=True can be saved")
+        vocabulary = [None] * len(vectorizer.vocabulary_)
+        for term, column in vectorizer.vocabulary_.items():
+            vocabulary[column] = term
+        idf = np.ascontiguousarray(vectorizer.idf_, dtype=np.float32)
+        params = {key: getattr(vectorizer, key) for key in TOKENIZER_PARAMS}
+        params.update(sublinear_tf=vectorizer.sublinear_tf, norm=vectorizer.norm)
+
+        vocab_payload = json.dumps(vocabulary).encode("utf-8")
+        digest = hashlib.sha1(vocab_payload + idf.tobytes()).hexdigest()[:8]
+        version = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{digest}"
+
+        # Write into a temp directory and rename it so a version appears complete or not at all
+        os.makedirs(self.vectorizers_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=self.vectorizers_dir)
+        np.save(os.path.join(tmp_dir, IDF_FILE), idf)
+        with open(os.path.join(tmp_dir, VOCAB_FILE), "wb") as f:
+            f.write(vocab_payload)
+        with open(os.path.join(tmp_dir, PARAMS_FILE), "w", encoding="utf-8") as f:
+            json.dump(params, f)
+        os.replace(tmp_dir, self._artifact_path(version))
+        logger.info(f"Saved TF-IDF vectorizer version {version}")
+        return version
+
+    def activate(self, version: str, **metadata):
+        """Point CURRENT at a saved version; running workers pick it up on their next check"""
+        if not os.path.exists(self._artifact_path(version)) and not os.path.exists(self._pickle_path(version)):
+            raise ValueError(f"Vectorizer version {version} does not exist")
+        pointer = {"version": version, "activated_at": datetime.utcnow().isoformat(), **metadata}
+        self._write_atomic(self.pointer_path, json.dumps(pointer).encode("utf-8"))
+        logger.info(f"Activated TF-IDF vectorizer version {version}")
+
+    def read_pointer(self) -> Optional[Dict[str, Any]]:
+        """Return the CURRENT pointer, or None if no version has been activated"""
+        try:
+            with open(self.pointer_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def embedding_digest(self, version: str) -> Optional[str]:
+        """SHA-1 of everything a saved version's embeddings depend on (vocabulary, IDF weights
+        and parameters), or None for pickled versions"""
+        path = self._artifact_path(version)
+        if not os.path.isdir(path):
+            return None
+        digest = hashlib.sha1()
+        for name in (VOCAB_FILE, PARAMS_FILE):
+            with open(os.path.join(path, name), "rb") as f:
+                digest.update(f.read())
+        # The array bytes, not the .npy file, so header differences do not matter
+        digest.update(np.load(os.path.join(path, IDF_FILE)).tobytes())
+        return digest.hexdigest()
+
+    def load(self, version: str) -> Any:
+        """Load a saved vectorizer version, memory-mapping its IDF weights"""
+        path = self._artifact_path(version)
+        if os.path.isdir(path):
+            return MappedTfidfVectorizer.load(path)
+        with open(self._pickle_path(version), "rb") as f:
+            return pickle.load(f)
+
+    def load_active(self) -> Tuple[Optional[str], Optional[Any], Dict[str, Any]]:
+        """Load the active vectorizer as (version, vectorizer, pointer metadata).
+
+        Falls back to the legacy unversioned pickle, and returns (None, None, {})
+        when nothing has been fitted yet.
+        """
+        pointer = self.read_pointer()
+        if pointer:
+            return pointer["version"], self.load(pointer["version"]), pointer
+
+        legacy_path = os.path.join(self.models_dir, LEGACY_VECTORIZER_FILE)
+        if os.path.exists(legacy_path):
+            with open(legacy_path, "rb") as f:
+                return "legacy", pickle.load(f), {}
+
+        return None, None, {}
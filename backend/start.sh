@@ -5,5 +5,8 @@ set -e
 mkdir -p /app/logs
 chmod 777 /app/logs
 
+# Bring the database schema up to date before serving
+python -m app.commands.migrate
+
 # Start the application with error logging
 exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload --log-level debug
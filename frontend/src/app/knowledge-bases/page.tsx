@@ -48,10 +48,10 @@ export default function KnowledgeBasesPage() {
   }, [retryCount, fetchKnowledgeBases]);
 
   const renderKnowledgeBaseCard = (kb: KnowledgeBase) => {
-    // Safely get document count - guard against undefined properties
-    const documentCount = kb.documents && Array.isArray(kb.documents) 
-      ? kb.documents.length 
-      : 0;
+    // Prefer the server-side count; fall back to the document list for older responses
+    const documentCount = typeof kb.documents_count === 'number'
+      ? kb.documents_count
+      : kb.documents && Array.isArray(kb.documents) ? kb.documents.length : 0;
     
     // Safely format date with fallback
     const updatedDate = kb.updated_at 
@@ -19,6 +19,8 @@ export interface KnowledgeBase {
     name: string;
   };
   documents: Document[];
+  // Only set on listings, whose documents omit content
+  documents_count?: number;
 }
 
 export interface KnowledgeBaseCreate {
@@ -34,7 +36,7 @@ export interface KnowledgeBaseUpdate {
 /**
  * Get all knowledge bases
  */
-export function getKnowledgeBases(params?: { skip?: number; limit?: number }) {
+export function getKnowledgeBases(params?: { skip?: number; limit?: number; cursor?: string; include_documents?: boolean }) {
   return get<KnowledgeBase[]>('/knowledge-bases/', params);
 }
 